@@ -1,132 +1,254 @@
+import os
+from collections import deque
+from functools import partial
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
+
+import anomalies
+import response
+import views
+from cube import CubeIndex
+from filter_cache import FilterCache
+from ingest import SOURCE_CSV, snapshot_meta
+from metrics import fmt
+from periods import label_periods, month_label
+from profiling import Profiler, count_rows
+from refresher import Refresher
+from shared import attach
+from sources import load_data, sources_signature
+from store import STORE_DIR, store_version
+
+# "pandas" (default) keeps the cube in memory; "duckdb" runs every tab's
+# filter + groupby as SQL against a local DuckDB file (pip install duckdb)
+BACKEND = os.environ.get("FOSPHA_BACKEND", "pandas")
+
+# A directory or glob of per-market/brand exports to load in parallel
+# instead of the single CSV (pandas backend), e.g. FOSPHA_SOURCES="exports/*/*.csv"
+SOURCES = os.environ.get("FOSPHA_SOURCES")
+
+# FOSPHA_SHARED=1: replicas on one host map a single read-only copy of the
+# cube from .fospha_cache/shared instead of each holding their own
+SHARED = os.environ.get("FOSPHA_SHARED") == "1"
+
+# How often (seconds) the background refresher checks the source for changes
+REFRESH_SECONDS = float(os.environ.get("FOSPHA_REFRESH_SECONDS", 10))
 
 st.set_page_config(page_title="Fospha – Simplified Dashboard", layout="wide")
-from PIL import Image
 
-# Load logo
-logo = Image.open("fospha_logo.png")  # make sure this file is in your project folder
+
+@st.cache_resource
+def load_logo():
+    # Read once per process as raw bytes - no PIL import or decode per run
+    with open("fospha_logo.png", "rb") as f:  # make sure this file is in your project folder
+        return f.read()
+
 
 # Display at the top
-st.image(logo, width=200)  # width in pixels
+st.image(load_logo(), width=200)  # width in pixels
 st.title("Fospha Marketing Performance Dashboard")
 st.markdown("by: Tyler Fox")
+
 # ------------------
-# Load data
+# Profiling (opt-in): FOSPHA_PROFILE=1 or ?profile=1 shows per-stage timings
+# in the sidebar; FOSPHA_PROFILE=log also logs each stage as a JSON record
 # ------------------
-@st.cache_data
-def load_data():
-    df = pd.read_csv("Fospha Data 2.csv", sep=";")
-    df["Date"] = pd.to_datetime(df["Date"])
-    df["Month"] = df["Date"].dt.strftime("%b")
-    return df
-
-df = load_data()
-
-num_cols = [
-    "Cost",
-    "Fospha Attribution Conversions",
-    "Fospha Attribution Revenue",
-    "Fospha Attribution New Conversions"
-]
-for col in num_cols:
-    df[col] = pd.to_numeric(df[col], errors="coerce").round(2)
+PROFILE = os.environ.get("FOSPHA_PROFILE") or st.query_params.get("profile", "0")
+
+if "profile_history" not in st.session_state:
+    st.session_state["profile_history"] = deque(maxlen=500)
+    st.session_state["profile_run"] = 0
+st.session_state["profile_run"] += 1
+
+profiler = Profiler(
+    enabled=PROFILE != "0",
+    log=PROFILE == "log",
+    history=st.session_state["profile_history"],
+    run=st.session_state["profile_run"]
+)
+profiler.view = "startup"
 
 # ------------------
-# Tabs
+# Load data
 # ------------------
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-    "Task 4",
-    "Task 5",
-    "Task 6",
-    "Task 7",
-    "Bonus Task 1",
-    "Bonus Task 2"
-    
-])
+# Only appended to when a cached loader's body actually runs, i.e. on a miss
+_cache_misses = []
+
+
+def source_paths():
+    # Absolute, resolved once: the refresher polls long after this run, and
+    # mustn't follow the process's working directory if it changes
+    return dict(
+        csv_path=os.path.abspath(SOURCE_CSV),
+        store_dir=os.path.abspath(STORE_DIR),
+        sources=SOURCES and os.path.abspath(SOURCES),
+    )
+
+
+def source_key(paths, version, signature):
+    # Identifies the dataset without loading it, so replicas agree on it
+    if signature:
+        return repr(signature)
+    if version is not None:
+        return f"store:{paths['store_dir']}:{version}"
+    st_ = os.stat(paths["csv_path"])
+    return f"csv:{paths['csv_path']}:{st_.st_size}:{st_.st_mtime_ns}"
+
+
+def watch_key(paths):
+    # Cheap to poll: file stats and the store's version, nothing is read
+    if BACKEND == "duckdb":
+        from sql_backend import source_token
+        return source_token(paths["csv_path"], paths["store_dir"])
+    version = store_version(paths["store_dir"])
+    signature = paths["sources"] and sources_signature(paths["sources"])
+    return version, source_key(paths, version, signature)
+
+
+def build_snapshot(paths, key):
+    # Everything a run reads from, built together so it's always consistent
+    if BACKEND == "duckdb":
+        from sql_backend import open_database
+        con = open_database(paths["csv_path"], paths["store_dir"])
+        # DuckDB already aggregates on disk, so the deep dives query it directly
+        return {"data": con, "token": key, "rows": None,
+                "partials": {name: con for name in views.ROLLUPS}, "memory": None}
+
+    # Tabs only ever sum the measures, so this is the daily cube, not the
+    # rows - from FOSPHA_SOURCES, the incremental store (python store.py ...)
+    # if it has data, else the CSV. Filters resolve through per-value row
+    # positions instead of column scans; shared, cube and index are both
+    # mapped from the host-wide copy.
+    _, source = key
+    load = partial(load_data, paths["csv_path"], paths["sources"], paths["store_dir"])
+    if SHARED:
+        index = attach(source, load)
+        cube = index.cube
+    else:
+        cube = load()
+        index = CubeIndex(cube)
+    return {
+        "data": index,
+        "token": cube.attrs["token"],
+        "rows": len(cube),
+        # Rows and memory before/after typing, when the CSV snapshot is the source
+        "memory": (
+            None if paths["sources"] or store_version(paths["store_dir"]) is not None
+            else snapshot_meta(paths["csv_path"])
+        ),
+        # The deep dives answer from per-(month, channel) and per-(month, source) partials
+        "partials": views.rollups(cube),
+    }
+
+
+@st.cache_resource(max_entries=1)
+def get_refresher(csv_path, store_dir, sources):
+    _cache_misses.append("get_refresher")
+    # One per server process. The first run waits for the initial build;
+    # after that, a replaced export is picked up by the background thread
+    # and no request ever pays for a reload. Once evicted or cleared, its
+    # thread stops at the next poll (see refresher.py).
+    paths = dict(csv_path=csv_path, store_dir=store_dir, sources=sources)
+    return Refresher(
+        partial(watch_key, paths), partial(build_snapshot, paths), interval=REFRESH_SECONDS
+    ).start()
+
+
+# Taken once per run: every view in this run (and its fragment reruns) reads
+# the same snapshot even if a newer one is swapped in meanwhile.
+# `data` is whatever the views module queries: a CubeIndex or a DuckDB connection.
+with profiler.stage("load") as record:
+    snapshot = get_refresher(**source_paths()).current()
+    record.update(rows_out=snapshot["rows"], cache="miss" if _cache_misses else "hit")
+
+data = snapshot["data"]
+data_token = snapshot["token"]
+partials = snapshot["partials"]
+# Rows each query scans (unknown for DuckDB, which scans on disk)
+data_rows = snapshot["rows"]
+
+
+@st.cache_resource
+def get_view_cache():
+    # One per server process, shared by every session
+    return FilterCache()
+
+view_cache = get_view_cache()
+view_cache.bind(data_token)
+
+
+def run_view(compute, *args, **kwargs):
+    return profiler.call(compute.__name__, compute, data, *args, rows_in=data_rows, **kwargs)
+
+
+def cached_view(name, compute, rows_in=None, **filters):
+    rows_in = data_rows if rows_in is None else rows_in
+    with profiler.stage(name, rows_in=rows_in) as record:
+        # Keyed on the snapshot too: a session still on the previous one
+        # must never be handed results computed from the new one
+        result, hit = view_cache.get_or_compute(
+            (name, data_token), compute, with_status=True, **filters
+        )
+        record.update(rows_out=count_rows(result), cache="hit" if hit else "miss")
+    return result
+
+
+def show_table(table, **kwargs):
+    # Styler formatting happens while the table is marshalled, so it's timed here
+    with profiler.stage("table", rows_in=count_rows(getattr(table, "data", table))):
+        st.dataframe(table, **kwargs)
+
+
+def show_chart(fig, **kwargs):
+    # Covers plotly JSON serialization
+    with profiler.stage("chart", rows_in=sum(len(t.x) for t in fig.data if t.x is not None)):
+        st.plotly_chart(fig, **kwargs)
+
+
+def select_grain(key):
+    # Day/Week series are LTTB-downsampled and drawn with WebGL traces, so
+    # the figure payload stays bounded however long the date range is
+    return st.radio("Granularity", views.GRAINS, horizontal=True, key=key)
+
+
+# Month filter options come from the data, oldest first
+available_months = cached_view("available_months", partial(views.available_months, data))
+
+# The hand-written commentary under Tasks 4-7 analyses the Jun-Oct 2025
+# export (Task 6: October alone). The tables and charts follow the data,
+# so the text is only shown while it still describes what's on screen.
+COMMENTARY_MONTHS = (202506, 202510)
+
+
+def show_commentary(months, described=COMMENTARY_MONTHS):
+    """True if the commentary written for `described` applies to `months` (first, last)."""
+    if tuple(months) == described:
+        return True
+    first, last = (month_label(m) for m in described)
+    span = first if first == last else f"{first}–{last}"
+    st.caption(f"The written commentary describes {span} and is hidden for this data.")
+    return False
+
+
+# Figures (and with them plotly) are imported inside each view rather than
+# at the top, so a new session's first paint never waits on them.
 
 # ------------------
 # TAB 1: ROAS by Channel
 # ------------------
-with tab1:
+def render_channel_roas():
+    import figures
+
     st.header("ROAS by Channel (Paid Only)")
 
-    paid_channels = [
-        "Paid Search - Generic",
-        "Paid Shopping",
-        "Paid Social",
-        "Performance Max"
-    ]
+    channel_pivot = run_view(views.channel_roas)
 
-    channel_filtered = df[df["Channel"].isin(paid_channels)]
+    show_table(figures.channel_roas_table(channel_pivot), use_container_width=True)
 
-    channel_pivot = (
-        channel_filtered
-        .groupby("Channel")
-        .agg(
-            Cost=("Cost", "sum"),
-            Revenue=("Fospha Attribution Revenue", "sum"),
-            New_Conversions=("Fospha Attribution New Conversions", "sum"),
-            Total_Conversions=("Fospha Attribution Conversions", "sum")
-        )
-        .reset_index()
-    )
-
-    # Returning conversions
-    channel_pivot["Returning_Conversions"] = (
-        channel_pivot["Total_Conversions"] - channel_pivot["New_Conversions"]
-    ).clip(lower=0)
-
-    # Core metrics
-    channel_pivot["ROAS"] = (channel_pivot["Revenue"] / channel_pivot["Cost"]).round(2)
-    channel_pivot["CAC"] = (channel_pivot["Cost"] / channel_pivot["New_Conversions"]).round(2)
-    channel_pivot["CPP"] = (channel_pivot["Cost"] / channel_pivot["Total_Conversions"]).round(2)
-    channel_pivot["AOV"] = (channel_pivot["Revenue"] / channel_pivot["Total_Conversions"]).round(2)
-
-    # Right before st.dataframe(...)
-    display_table = channel_pivot.rename(
-        columns={
-            "New_Conversions": "New Conversions",
-            "Returning_Conversions": "Returning Conversions"
-        }
-    )
-    
-    st.dataframe(
-        display_table[[
-            "Channel",
-            "Cost",
-            "Revenue",
-            "ROAS",
-            "CAC",
-            "CPP",
-            "AOV",
-            "New Conversions",
-            "Returning Conversions"
-        ]].style.format({
-            "Cost": "£{:,.0f}",
-            "Revenue": "£{:,.0f}",
-            "ROAS": "{:.2f}",
-            "CAC": "£{:,.2f}",
-            "CPP": "£{:,.2f}",
-            "AOV": "£{:,.2f}",
-            "New Conversions": "{:.2f}",
-            "Returning Conversions": "{:.2f}"
-        }),
-        use_container_width=True
-    )
-
-
-    # Chart stays simple (ROAS only)
-    fig_channel_roas = px.bar(
-        channel_pivot,
-        x="Channel",
-        y="ROAS",
-        title="Return on Advertising Spend by Paid Channel"
-    )
-    st.plotly_chart(fig_channel_roas, use_container_width=True)
+    show_chart(figures.channel_roas_bar(channel_pivot), use_container_width=True)
 
     st.markdown("---")
+    if not show_commentary((available_months[0], available_months[-1])):
+        return
     st.subheader("Insights / Commentary")
     st.markdown("""
     **Best Efficiency:**  
@@ -152,44 +274,26 @@ with tab1:
 # ------------------
 # TAB 2: Paid Social ROAS over time
 # ------------------
-with tab2:
-    st.header("Paid Social ROAS Over Time (Jun–Oct)")
-
-    paid_social = df[df["Channel"] == "Paid Social"]
-
-    paid_social_pivot = (
-        paid_social
-        .groupby("Month")
-        .agg(
-            Cost=("Cost", "sum"),
-            Revenue=("Fospha Attribution Revenue", "sum")
-        )
-        .reset_index()
-    )
+def render_paid_social_roas():
+    import figures
 
-    paid_social_pivot["ROAS"] = (
-        paid_social_pivot["Revenue"] / paid_social_pivot["Cost"]
+    st.header(
+        f"Paid Social ROAS Over Time "
+        f"({month_label(available_months[0])}–{month_label(available_months[-1])})"
     )
 
-    paid_social_pivot["Month"] = pd.Categorical(
-        paid_social_pivot["Month"],
-        categories=["Jun", "Jul", "Aug", "Sep", "Oct"],
-        ordered=True
-    )
-    paid_social_pivot = paid_social_pivot.sort_values("Month")
+    grain = select_grain("task5_grain")
+    paid_social_pivot = label_periods(run_view(views.paid_social_roas, grain=grain), grain)
 
-    st.dataframe(paid_social_pivot)
+    show_table(paid_social_pivot)
 
-    fig_paid_social_roas = px.line(
-        paid_social_pivot,
-        x="Month",
-        y="ROAS",
-        markers=True,
-        title="Paid Social ROAS Over Time"
+    show_chart(
+        figures.paid_social_roas_line(paid_social_pivot, grain), use_container_width=True
     )
-    st.plotly_chart(fig_paid_social_roas, use_container_width=True)
 
     st.markdown("---")
+    if not show_commentary((available_months[0], available_months[-1])):
+        return
     st.subheader("Insights / Commentary")
     
     st.markdown("""
@@ -213,82 +317,27 @@ with tab2:
     """)
 
 # ------------------
-# TAB 3: Paid Social – CAC & Cost by Source (October)
+# TAB 3: Paid Social – CAC & Cost by Source (latest month)
 # ------------------
-import plotly.graph_objects as go
-
-with tab3:
-    st.header("Paid Social – CAC & Cost by Source (October)")
-
-    october_paid_social = paid_social[paid_social["Month"] == "Oct"]
+def render_paid_social_sources():
+    import figures
 
-    source_pivot = (
-        october_paid_social
-        .groupby("Source")
-        .agg(
-            Cost=("Cost", "sum"),
-            New_Conversions=("Fospha Attribution New Conversions", "sum")
-        )
-        .reset_index()
-    )
-
-    source_pivot["CAC"] = source_pivot["Cost"] / source_pivot["New_Conversions"]
-
-    # ---- Explicit ordering (Pinterest last) ----
-    source_order = [
-        s for s in source_pivot["Source"].unique()
-        if s.lower() != "pinterest"
-    ] + ["Pinterest"]
-
-    source_pivot["Source"] = pd.Categorical(
-        source_pivot["Source"],
-        categories=source_order,
-        ordered=True
-    )
+    month = available_months[-1]
+    st.header(f"Paid Social – CAC & Cost by Source ({month_label(month)})")
 
-    source_pivot = source_pivot.sort_values("Source")
-
-    st.dataframe(source_pivot)
-
-    # ---- Chart ----
-    fig = go.Figure()
-
-    # Cost (bars, left axis)
-    fig.add_trace(
-        go.Bar(
-            x=source_pivot["Source"],
-            y=source_pivot["Cost"],
-            name="Cost",
-            yaxis="y1"
-        )
-    )
+    # Pinterest ordered last
+    source_pivot = run_view(views.paid_social_sources, month=month)
 
-    # CAC (line, right axis)
-    fig.add_trace(
-        go.Scatter(
-            x=source_pivot["Source"],
-            y=source_pivot["CAC"],
-            name="CAC",
-            yaxis="y2",
-            mode="lines+markers"
-        )
-    )
+    show_table(source_pivot)
 
-    fig.update_layout(
-        title="Paid Social Cost & CAC by Source (October)",
-        xaxis_title="Source",
-        yaxis=dict(title="Cost"),
-        yaxis2=dict(
-            title="CAC",
-            overlaying="y",
-            side="right"
-        ),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    fig = figures.source_cost_cac(
+        source_pivot, f"Paid Social Cost & CAC by Source ({month_label(month)})"
     )
-
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(fig, use_container_width=True)
 
     st.markdown("---")
+    if not show_commentary((month, month), described=(202510, 202510)):
+        return
     st.subheader("Paid Social Source October Insights")
 
     st.markdown("#### TL;DR: Facebook is currently over-invested relative to its high CAC; shifting budget toward Snapchat and TikTok, while testing Pinterest, should improve efficiency and overall Paid Social ROI")
@@ -316,79 +365,26 @@ with tab3:
 # ------------------
 # TAB 4: UK – Cost & Revenue over time
 # ------------------
-import plotly.graph_objects as go
 
-# ------------------
-# TAB 4: UK – Cost & Revenue over time
-# ------------------
-import plotly.graph_objects as go
+def render_uk_cost_revenue():
+    import figures
 
-with tab4:
     st.header("UK Cost & Revenue Over Time")
 
-    uk_data = df[df["Market"] == "UK"]
-
-    uk_pivot = (
-        uk_data
-        .groupby("Month")
-        .agg(
-            Cost=("Cost", "sum"),
-            Revenue=("Fospha Attribution Revenue", "sum")
-        )
-        .reset_index()
-    )
-
-    uk_pivot["Month"] = pd.Categorical(
-        uk_pivot["Month"],
-        categories=["Jun", "Jul", "Aug", "Sep", "Oct"],
-        ordered=True
+    grain = select_grain("task7_grain")
+    uk_pivot = label_periods(
+        run_view(views.market_cost_revenue, market="UK", grain=grain), grain
     )
-    uk_pivot = uk_pivot.sort_values("Month")
 
-    st.dataframe(uk_pivot)
+    show_table(uk_pivot)
 
-    fig = go.Figure()
-
-    # Cost (left axis)
-    fig.add_trace(
-        go.Scatter(
-            x=uk_pivot["Month"],
-            y=uk_pivot["Cost"],
-            name="Cost",
-            mode="lines+markers",
-            yaxis="y1",
-            line=dict(color="red")
-        )
-    )
-
-    # Revenue (right axis)
-    fig.add_trace(
-        go.Scatter(
-            x=uk_pivot["Month"],
-            y=uk_pivot["Revenue"],
-            name="Revenue",
-            mode="lines+markers",
-            yaxis="y2",
-            line=dict(color="green")
-        )
+    show_chart(
+        figures.market_cost_revenue_lines(uk_pivot, grain, "UK"), use_container_width=True
     )
 
-    fig.update_layout(
-        title="UK Cost & Revenue Over Time",
-        xaxis_title="Month",
-        height=600,
-        yaxis=dict(title="Cost"),
-        yaxis2=dict(
-            title="Revenue",
-            overlaying="y",
-            side="right"
-        ),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-    )
-
-    st.plotly_chart(fig, use_container_width=True)
-
     st.markdown("---")
+    if not show_commentary((available_months[0], available_months[-1])):
+        return
     st.subheader("Cost & Revenue Insights")
     
     st.markdown("""
@@ -404,369 +400,359 @@ with tab4:
     """)
 
 
-with tab5:
+# ------------------
+# Deep dives run as fragments: a filter change reruns only its own section
+# (and the time series filters only their chart), not the whole script.
+# Their views are memoized in view_cache by filter state.
+# ------------------
+@st.fragment
+def render_paid_channel_time_series(selected_months, available_channels):
+    import figures
+
+    # --------------------
+    # 5️⃣ Paid Cost vs Revenue Over Time (dual-axis) with channel filter
+    # --------------------
+    selected_channels = st.multiselect(
+        "Select Channel(s) for Time Series",
+        options=available_channels,
+        default=available_channels,
+        key="bonus1_channels" # show all by default
+    )
+    grain = select_grain("bonus1_grain")
+
+    time_pivot = label_periods(cached_view(
+        "paid_channel_time", partial(views.paid_channel_time_series, data),
+        months=selected_months, channels=selected_channels, grain=grain
+    ), grain)
+
+    fig_time = figures.cost_vs_revenue(
+        time_pivot, grain, "Paid Channel Cost vs Revenue Over Time"
+    )
+    show_chart(fig_time, use_container_width=True)
+
+
+@st.fragment
+def render_paid_social_time_series(selected_months, available_sources):
+    import figures
+
+    # --------------------
+    # 5️⃣ Optional: Cost vs Revenue over time by source (dual-axis + multi-select)
+    # --------------------
+    selected_sources = st.multiselect(
+        "Select Source(s) for Time Series",
+        options=available_sources,
+        default=available_sources,
+        key="bonus2_sources"
+    )
+    grain = select_grain("bonus2_grain")
+
+    time_pivot = label_periods(cached_view(
+        "paid_social_time", partial(views.paid_social_time_series, data),
+        months=selected_months, sources=selected_sources, grain=grain
+    ), grain)
+
+    fig_time = figures.cost_vs_revenue(
+        time_pivot, grain, "Paid Social Cost vs Revenue Over Time"
+    )
+    show_chart(fig_time, use_container_width=True)
+
+
+@st.fragment
+def render_paid_channel_deep_dive():
+    import figures
+
     st.header("Paid Channel Deep Dive")
 
     # --------------------
     # Month filter (multi-select)
     # --------------------
-    all_months = ["Jun", "Jul", "Aug", "Sep", "Oct"]
     selected_months = st.multiselect(
         "Select Month(s)",
-        options=all_months,
-        default=all_months,
+        options=available_months,
+        default=available_months,
+        format_func=month_label,
         key="bonus1_months"
     )
 
     # --------------------
     # Filtered data
     # --------------------
-    paid_channels = [
-        "Paid Search - Generic",
-        "Paid Shopping",
-        "Paid Social",
-        "Performance Max"
-    ]
-    df_paid = df[
-        (df["Channel"].isin(paid_channels)) &
-        (df["Month"].isin(selected_months))
-    ]
+    kpi, channel_pivot = cached_view(
+        "paid_channel", partial(views.paid_channel_deep_dive, partials["paid_channel"]),
+        rows_in=count_rows(partials["paid_channel"]), months=selected_months
+    )
 
     # --------------------
     # 1️⃣ KPI Strip
     # --------------------
-    total_cost = df_paid["Cost"].sum()
-    total_revenue = df_paid["Fospha Attribution Revenue"].sum()
-    total_new = df_paid["Fospha Attribution New Conversions"].sum()
-    total_total = df_paid["Fospha Attribution Conversions"].sum()
-    total_returning = total_total - total_new
-    total_returning = max(total_returning, 0)
-    roas = total_revenue / total_cost if total_cost > 0 else None
-    cac = total_cost / total_new if total_new > 0 else None
-    cpp = total_cost / total_total if total_total > 0 else None
-    aov = total_revenue / total_total if total_total > 0 else None
-    pct_new = total_new / total_total if total_total > 0 else None
-
     k1, k2, k3, k4, k5, k6 = st.columns(6)
-    k1.metric("Total Cost (£)", f"{total_cost:,.0f}")
-    k2.metric("Total Revenue (£)", f"{total_revenue:,.0f}")
-    k3.metric("ROAS", f"{roas:.2f}")
-    k4.metric("CAC (£)", f"{cac:,.2f}")
-    k5.metric("CPP (£)", f"{cpp:,.2f}")
-    k6.metric("% New Conversions", f"{pct_new:.0%}")
+    k1.metric("Total Cost (£)", fmt(kpi["Cost"], ",.0f"))
+    k2.metric("Total Revenue (£)", fmt(kpi["Revenue"], ",.0f"))
+    k3.metric("ROAS", fmt(kpi["ROAS"], ".2f"))
+    k4.metric("CAC (£)", fmt(kpi["CAC"], ",.2f"))
+    k5.metric("CPP (£)", fmt(kpi["CPP"], ",.2f"))
+    k6.metric("% New Conversions", fmt(kpi["Pct_New"], ".0%"))
 
     # --------------------
     # 2️⃣ Channel Efficiency Matrix (ROAS vs CAC)
     # --------------------
-    channel_pivot = (
-        df_paid.groupby("Channel")
-        .agg(
-            Cost=("Cost", "sum"),
-            Revenue=("Fospha Attribution Revenue", "sum"),
-            New_Conversions=("Fospha Attribution New Conversions", "sum"),
-            Total_Conversions=("Fospha Attribution Conversions", "sum")
-        )
-        .reset_index()
-    )
-
-    channel_pivot["CAC"] = channel_pivot["Cost"] / channel_pivot["New_Conversions"]
-    channel_pivot["ROAS"] = channel_pivot["Revenue"] / channel_pivot["Cost"]
-
-    fig_matrix = go.Figure()
-    fig_matrix.add_trace(
-        go.Scatter(
-            x=channel_pivot["CAC"],
-            y=channel_pivot["ROAS"],
-            mode="markers+text",
-            text=channel_pivot["Channel"],
-            textposition="top center",
-            marker=dict(size=channel_pivot["Cost"] / 1000, sizemode="area", sizeref=2),
-            name="Channel"
-        )
-    )
-
-    fig_matrix.update_layout(
-        title="Paid Channel Efficiency (ROAS vs CAC, bubble size = spend)",
-        xaxis_title="CAC (£)",
-        yaxis_title="ROAS",
-        template="plotly_white"
-    )
-
-    st.plotly_chart(fig_matrix, use_container_width=True)
+    show_chart(figures.channel_efficiency(channel_pivot), use_container_width=True)
 
     # --------------------
     # 3️⃣ New vs Returning Conversions by Channel (stacked bar)
     # --------------------
-    channel_pivot["Returning_Conversions"] = (
-        channel_pivot["Total_Conversions"] - channel_pivot["New_Conversions"]
-    ).clip(lower=0)
-
-    fig_stack = go.Figure()
-    fig_stack.add_trace(
-        go.Bar(
-            x=channel_pivot["Channel"],
-            y=channel_pivot["New_Conversions"],
-            name="New Conversions"
-        )
-    )
-    fig_stack.add_trace(
-        go.Bar(
-            x=channel_pivot["Channel"],
-            y=channel_pivot["Returning_Conversions"],
-            name="Returning Conversions"
-        )
+    fig_stack = figures.new_vs_returning(
+        channel_pivot, "Channel", "New vs Returning Conversions by Paid Channel"
     )
-    fig_stack.update_layout(
-        title="New vs Returning Conversions by Paid Channel",
-        barmode="stack",
-        xaxis_title="Channel",
-        yaxis_title="Conversions",
-        template="plotly_white"
-    )
-    st.plotly_chart(fig_stack, use_container_width=True)
+    show_chart(fig_stack, use_container_width=True)
 
     # --------------------
     # 4️⃣ CAC vs CPP Table
     # --------------------
-    channel_pivot["CPP"] = channel_pivot["Cost"] / channel_pivot["Total_Conversions"]
-    channel_pivot["AOV"] = channel_pivot["Revenue"] / channel_pivot["Total_Conversions"]
-
     st.subheader("Paid Channel Metrics Table")
-    st.dataframe(
-        channel_pivot[[
-            "Channel", "Cost", "Revenue", "ROAS", "CAC", "CPP", "AOV",
-            "New_Conversions", "Returning_Conversions"
-        ]].style.format({
-            "Cost": "£{:,.0f}",
-            "Revenue": "£{:,.0f}",
-            "ROAS": "{:.2f}",
-            "CAC": "£{:,.2f}",
-            "CPP": "£{:,.2f}",
-            "AOV": "£{:,.2f}"
-        }),
-        use_container_width=True
-    )
+    show_table(figures.metrics_table(channel_pivot, "Channel"), use_container_width=True)
 
-        # --------------------
-    # 5️⃣ Paid Cost vs Revenue Over Time (dual-axis) with channel filter
-    # --------------------
-    available_channels = sorted(df_paid["Channel"].unique())
-    selected_channels = st.multiselect(
-        "Select Channel(s) for Time Series",
-        options=available_channels,
-        default=available_channels,
-        key="bonus1_channels" # show all by default
+    render_paid_channel_time_series(
+        selected_months, sorted(channel_pivot["Channel"].unique())
     )
 
-    df_time_filtered = df_paid[df_paid["Channel"].isin(selected_channels)]
-
-    time_pivot = (
-        df_time_filtered.groupby("Month")
-        .agg(
-            Cost=("Cost", "sum"),
-            Revenue=("Fospha Attribution Revenue", "sum")
-        )
-        .reset_index()
-    )
 
-    fig_time = go.Figure()
-    fig_time.add_trace(
-        go.Scatter(
-            x=time_pivot["Month"],
-            y=time_pivot["Cost"],
-            mode="lines+markers",
-            name="Cost",
-            yaxis="y1"
-        )
-    )
-    fig_time.add_trace(
-        go.Scatter(
-            x=time_pivot["Month"],
-            y=time_pivot["Revenue"],
-            mode="lines+markers",
-            name="Revenue",
-            yaxis="y2"
-        )
-    )
-    fig_time.update_layout(
-        title="Paid Channel Cost vs Revenue Over Time",
-        xaxis_title="Month",
-        yaxis=dict(title="Cost (£)"),
-        yaxis2=dict(title="Revenue (£)", overlaying="y", side="right"),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        template="plotly_white"
-    )
-    st.plotly_chart(fig_time, use_container_width=True)
+@st.fragment
+def render_paid_social_deep_dive():
+    import figures
 
-with tab6:
     st.header("Paid Social Source Deep Dive")
 
     # --------------------
     # 1️⃣ Month multi-select filter
     # --------------------
-    all_months = ["Jun", "Jul", "Aug", "Sep", "Oct"]
     selected_months = st.multiselect(
         "Select Month(s)",
-        options=all_months,
-        default=all_months,
+        options=available_months,
+        default=available_months,
+        format_func=month_label,
         key="bonus2_months"
     )
 
     # --------------------
     # Filter Paid Social data
     # --------------------
-    df_paid_social = df[
-        (df["Channel"] == "Paid Social") &
-        (df["Month"].isin(selected_months))
-    ]
+    kpi, source_pivot = cached_view(
+        "paid_social", partial(views.paid_social_deep_dive, partials["paid_social"]),
+        rows_in=count_rows(partials["paid_social"]), months=selected_months
+    )
 
     # --------------------
     # 1️⃣ KPI Strip
     # --------------------
-    total_cost = df_paid_social["Cost"].sum()
-    total_revenue = df_paid_social["Fospha Attribution Revenue"].sum()
-    total_new = df_paid_social["Fospha Attribution New Conversions"].sum()
-    total_total = df_paid_social["Fospha Attribution Conversions"].sum()
-    total_returning = total_total - total_new
-    total_returning = max(total_returning, 0)
-    roas = total_revenue / total_cost if total_cost > 0 else None
-    cac = total_cost / total_new if total_new > 0 else None
-    cpp = total_cost / total_total if total_total > 0 else None
-    aov = total_revenue / total_total if total_total > 0 else None
-    pct_new = total_new / total_total if total_total > 0 else None
-
     k1, k2, k3, k4, k5, k6 = st.columns(6)
-    k1.metric("Total Cost (£)", f"{total_cost:,.0f}")
-    k2.metric("Total Revenue (£)", f"{total_revenue:,.0f}")
-    k3.metric("ROAS", f"{roas:.2f}")
-    k4.metric("CAC (£)", f"{cac:,.2f}")
-    k5.metric("CPP (£)", f"{cpp:,.2f}")
-    k6.metric("% New Conversions", f"{pct_new:.0%}")
+    k1.metric("Total Cost (£)", fmt(kpi["Cost"], ",.0f"))
+    k2.metric("Total Revenue (£)", fmt(kpi["Revenue"], ",.0f"))
+    k3.metric("ROAS", fmt(kpi["ROAS"], ".2f"))
+    k4.metric("CAC (£)", fmt(kpi["CAC"], ",.2f"))
+    k5.metric("CPP (£)", fmt(kpi["CPP"], ",.2f"))
+    k6.metric("% New Conversions", fmt(kpi["Pct_New"], ".0%"))
 
     # --------------------
     # 2️⃣ Cost vs CAC (secondary axis) — Pinterest last
     # --------------------
-    source_pivot = (
-        df_paid_social.groupby("Source")
-        .agg(
-            Cost=("Cost", "sum"),
-            New_Conversions=("Fospha Attribution New Conversions", "sum"),
-            Total_Conversions=("Fospha Attribution Conversions", "sum"),
-            Revenue=("Fospha Attribution Revenue", "sum")
-        )
-        .reset_index()
-    )
-    source_pivot["CAC"] = source_pivot["Cost"] / source_pivot["New_Conversions"]
-
-    # Explicit ordering: Pinterest last
-    source_order = [s for s in source_pivot["Source"].unique() if s.lower() != "pinterest"] + ["Pinterest"]
-    source_pivot["Source"] = pd.Categorical(source_pivot["Source"], categories=source_order, ordered=True)
-    source_pivot = source_pivot.sort_values("Source")
-
-    fig_cac = go.Figure()
-    fig_cac.add_trace(go.Bar(
-        x=source_pivot["Source"],
-        y=source_pivot["Cost"],
-        name="Cost",
-        yaxis="y1"
-    ))
-    fig_cac.add_trace(go.Scatter(
-        x=source_pivot["Source"],
-        y=source_pivot["CAC"],
-        name="CAC",
-        yaxis="y2",
-        mode="lines+markers"
-    ))
-    fig_cac.update_layout(
-        title="Paid Social Cost & CAC by Source",
-        xaxis_title="Source",
-        yaxis=dict(title="Cost (£)"),
-        yaxis2=dict(title="CAC (£)", overlaying="y", side="right"),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        template="plotly_white"
-    )
-    st.plotly_chart(fig_cac, use_container_width=True)
+    show_chart(figures.source_cost_cac_dive(source_pivot), use_container_width=True)
 
     # --------------------
     # 3️⃣ ROAS & Metrics Table
     # --------------------
-    source_pivot["CPP"] = source_pivot["Cost"] / source_pivot["Total_Conversions"]
-    source_pivot["AOV"] = source_pivot["Revenue"] / source_pivot["Total_Conversions"]
-    source_pivot["Returning_Conversions"] = source_pivot["Total_Conversions"] - source_pivot["New_Conversions"]
-    source_pivot["ROAS"] = source_pivot["Revenue"] / source_pivot["Cost"]
-
     st.subheader("Source Metrics Table")
-    st.dataframe(
-        source_pivot[[
-            "Source", "Cost", "Revenue", "ROAS", "CAC", "CPP", "AOV",
-            "New_Conversions", "Returning_Conversions"
-        ]].style.format({
-            "Cost": "£{:,.0f}",
-            "Revenue": "£{:,.0f}",
-            "ROAS": "{:.2f}",
-            "CAC": "£{:,.2f}",
-            "CPP": "£{:,.2f}",
-            "AOV": "£{:,.2f}"
-        }),
-        use_container_width=True
-    )
+    show_table(figures.metrics_table(source_pivot, "Source"), use_container_width=True)
 
     
     # --------------------
     # 4️⃣ New vs Returning Conversions by Source (stacked bar)
     # --------------------
-    fig_stack = go.Figure()
-    fig_stack.add_trace(go.Bar(
-        x=source_pivot["Source"],
-        y=source_pivot["New_Conversions"],
-        name="New Conversions"
-    ))
-    fig_stack.add_trace(go.Bar(
-        x=source_pivot["Source"],
-        y=source_pivot["Returning_Conversions"],
-        name="Returning Conversions"
-    ))
-    fig_stack.update_layout(
-        title="New vs Returning Conversions by Paid Social Source",
-        barmode="stack",
-        xaxis_title="Source",
-        yaxis_title="Conversions",
-        template="plotly_white"
+    fig_stack = figures.new_vs_returning(
+        source_pivot, "Source", "New vs Returning Conversions by Paid Social Source"
     )
-    st.plotly_chart(fig_stack, use_container_width=True)
+    show_chart(fig_stack, use_container_width=True)
 
-    # --------------------
-    # 5️⃣ Optional: Cost vs Revenue over time by source (dual-axis + multi-select)
-    # --------------------
-    available_sources = sorted(df_paid_social["Source"].unique())
-    selected_sources = st.multiselect(
-        "Select Source(s) for Time Series",
-        options=available_sources,
-        default=available_sources,
-        key="bonus2_sources"
+    render_paid_social_time_series(
+        selected_months, sorted(source_pivot["Source"].unique())
     )
 
-    df_time_filtered = df_paid_social[df_paid_social["Source"].isin(selected_sources)]
-    time_pivot = (
-        df_time_filtered.groupby("Month")
-        .agg(Cost=("Cost", "sum"), Revenue=("Fospha Attribution Revenue", "sum"))
-        .reset_index()
+# ------------------
+# Anomalies: ROAS / CAC breaks across every Market x Channel x Source series
+# ------------------
+@st.fragment
+def render_anomalies():
+    import figures
+
+    st.header("ROAS & CAC Anomalies")
+    st.markdown(
+        "Every Market × Channel × Source series is scored against its own trailing "
+        "baseline; a score is how many standard deviations a period's ROAS or CAC "
+        "sits from that series' recent mean."
+    )
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        grain = st.radio("Granularity", anomalies.SCAN_GRAINS, horizontal=True,
+                         key="anomaly_grain")
+    with c2:
+        threshold = st.slider("Flag at |score| ≥", 2.0, 6.0, 3.0, 0.5,
+                              key="anomaly_threshold")
+    with c3:
+        min_cost = st.number_input("Ignore periods with cost below (£)", 0.0, value=50.0,
+                                   step=50.0, key="anomaly_min_cost")
+
+    flags = cached_view(
+        "anomalies", partial(anomalies.scan, data),
+        grain=grain, threshold=threshold, min_cost=min_cost
+    )
+    summary = anomalies.flagged_series(flags, grain)
+
+    k1, k2, k3 = st.columns(3)
+    k1.metric("Flagged Series", f"{len(summary):,}")
+    k2.metric("Flagged Periods", f"{len(flags):,}")
+    k3.metric("Latest Flag", str(flags[grain].max().date()) if len(flags) else "–")
+
+    if summary.empty:
+        st.info("No series deviate from their baseline at this threshold.")
+        return
+
+    st.subheader("Flagged Series (worst first)")
+    show_table(summary, use_container_width=True, hide_index=True)
+
+    # Drill into one flagged series
+    labels = [
+        f"{r.Market} · {r.Channel} · {r.Source} — {r.Metric} ({r.Worst_Score:+.1f})"
+        for r in summary.itertuples()
+    ]
+    choice = st.selectbox("Series", range(len(labels)), format_func=labels.__getitem__,
+                          key="anomaly_series")
+    row = summary.iloc[choice]
+    detail = cached_view(
+        "anomaly_detail", partial(anomalies.series_detail, data),
+        market=row["Market"], channel=row["Channel"], source=row["Source"],
+        metric=row["Metric"], grain=grain, threshold=threshold, min_cost=min_cost
     )
+    show_chart(figures.anomaly_band(
+        detail, grain, row["Metric"],
+        f"{row['Market']} · {row['Channel']} · {row['Source']} — {row['Metric']} vs Baseline"
+    ), use_container_width=True)
 
-    fig_time = go.Figure()
-    fig_time.add_trace(go.Scatter(
-        x=time_pivot["Month"], y=time_pivot["Cost"], mode="lines+markers", name="Cost", yaxis="y1"
-    ))
-    fig_time.add_trace(go.Scatter(
-        x=time_pivot["Month"], y=time_pivot["Revenue"], mode="lines+markers", name="Revenue", yaxis="y2"
-    ))
-    fig_time.update_layout(
-        title="Paid Social Cost vs Revenue Over Time",
-        xaxis_title="Month",
-        yaxis=dict(title="Cost (£)"),
-        yaxis2=dict(title="Revenue (£)", overlaying="y", side="right"),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-        template="plotly_white"
-    )
-    st.plotly_chart(fig_time, use_container_width=True)
 
+# ------------------
+# Budget optimizer: fitted spend-response curves and the best split of a budget
+# ------------------
+LEVEL_LABELS = {"Channel": "Paid channels", "Source": "Paid Social sources"}
+
+
+@st.fragment
+def render_budget_optimizer():
+    import figures
+
+    st.header("Budget Optimizer")
+    st.markdown(
+        "Each series gets a diminishing-returns curve (daily revenue and new "
+        "conversions as a power of daily spend) fitted on its daily data. The "
+        "optimizer splits a total daily budget so every series ends at the same "
+        "marginal return, never past 1.5× its largest observed daily spend."
+    )
+
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        level = st.radio("Optimize across", list(response.LEVELS), horizontal=True,
+                         format_func=LEVEL_LABELS.get, key="budget_level")
+    with c2:
+        markets = cached_view(
+            "available_markets", partial(views.query, data, "Market", ["Cost"])
+        )["Market"].tolist()
+        market = st.selectbox("Market", ["All markets"] + markets, key="budget_market")
+    with c3:
+        target = st.radio("Maximize", response.TARGETS, horizontal=True,
+                          format_func=lambda t: t.replace("_", " "), key="budget_target")
+
+    # Fitted once per level / market (and dataset); the optimizer reruns on every budget
+    filters = {} if market == "All markets" else {"Market": market}
+    curves = cached_view(
+        "response_curves", partial(response.fit_curves, data), level=level, **filters
+    )
+    if curves.empty:
+        st.info("Not enough daily spend history to fit any curves here.")
+        return
+
+    current = float(curves["Current_Spend"].sum())
+    budget = st.slider(
+        "Total daily budget (£)", 0.0, float(round(2 * current)), float(round(current)),
+        step=max(float(round(current / 100)), 1.0), key=f"budget_{level}_{market}"
+    )
+    with profiler.stage("budget_optimizer", rows_in=len(curves)) as record:
+        plan = response.optimize(curves, budget, target=target)
+        record["rows_out"] = len(plan)
+
+    current_total = plan[f"Current_{target}"].sum()
+    optimal_total = plan[f"Optimal_{target}"].sum()
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Current Daily Spend (£)", fmt(current, ",.0f"))
+    k2.metric(f"Current Split: {target.replace('_', ' ')}", fmt(current_total, ",.0f"))
+    k3.metric(f"Optimal Split: {target.replace('_', ' ')}", fmt(optimal_total, ",.0f"))
+    k4.metric("Change", fmt(optimal_total / current_total - 1 if current_total else None, "+.1%"))
+
+    unspent = budget - plan["Optimal_Spend"].sum()
+    if unspent > 1:
+        st.caption(
+            f"£{unspent:,.0f} of the budget is left unallocated: every series is at "
+            f"its cap, where the fitted curves stop being reliable."
+        )
+
+    show_chart(figures.budget_split(plan, level), use_container_width=True)
+    show_chart(figures.response_curves(
+        response.curve_points(curves, target), plan, level, target
+    ), use_container_width=True)
+
+    st.subheader("Recommended Daily Split")
+    show_table(figures.budget_table(plan), use_container_width=True, hide_index=True)
+
+    with st.expander("Curve fits"):
+        show_table(curves, use_container_width=True, hide_index=True)
+
+
+# ------------------
+# Navigation
+# ------------------
+# Only the selected view's body runs on a rerun, so a widget change in one
+# view never recomputes or re-serializes the figures of the others.
+VIEWS = {
+    "Task 4": render_channel_roas,
+    "Task 5": render_paid_social_roas,
+    "Task 6": render_paid_social_sources,
+    "Task 7": render_uk_cost_revenue,
+    "Bonus Task 1": render_paid_channel_deep_dive,
+    "Bonus Task 2": render_paid_social_deep_dive,
+    "Anomalies": render_anomalies,
+    "Budget": render_budget_optimizer
+}
+
+selected_view = st.radio(
+    "View",
+    options=list(VIEWS),
+    horizontal=True,
+    label_visibility="collapsed",
+    key="view"
+)
+profiler.view = selected_view
+with profiler.stage("total"):
+    VIEWS[selected_view]()
+
+if profiler.enabled:
+    with st.sidebar:
+        st.subheader("Timings")
+        st.caption(
+            "View cache: {hits} hits / {misses} misses, {entries} entries".format(
+                **view_cache.stats()
+            )
+        )
+        st.dataframe(profiler.frame(), hide_index=True, use_container_width=True)
+        if snapshot["memory"]:
+            st.caption(
+                "Export: {rows:,} rows, {mem_before_mb:.1f} MB raw -> "
+                "{mem_after_mb:.1f} MB typed".format(**snapshot["memory"])
+            )
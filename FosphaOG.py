@@ -1,8 +1,11 @@
 import streamlit as st
-import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 
+import views
+from ingest import load_frame
+from metrics import fmt
+
 st.set_page_config(page_title="Marketing Performance", layout="wide")
 
 tab1, tab2, tab3, tab4 = st.tabs([
@@ -15,40 +18,24 @@ tab1, tab2, tab3, tab4 = st.tabs([
 # ---- Load data ----
 @st.cache_data
 def load_data():
-    df = pd.read_csv(
-        "Fospha Data 2.csv",
-        sep=";",
-        parse_dates=["Date"]
-    )
-    df["Date_Year_Month"] = df["Date"].dt.to_period("M").astype(str)
+    df = load_frame("Fospha Data 2.csv")
+    df["Date_Year_Month"] = df["Date"].dt.to_period("M").astype(str).astype("category")
     return df
 
 df = load_data()
 
-num_cols = ["Cost", "Fospha Attribution Conversions", "Fospha Attribution Revenue", "Fospha Attribution New Conversions"]
-for col in num_cols:
-    df[col] = pd.to_numeric(df[col], errors="coerce").round(2)
-
-
-# ---- Aggregations ----
-summary = df.groupby("Date_Year_Month").agg(
-    Total_Cost=("Cost", "sum"),
-    Total_Revenue=("Fospha Attribution Revenue", "sum"),
-    Total_New_Conv=("Fospha Attribution New Conversions", "sum")
-).reset_index()
-
-summary["ROAS"] = summary["Total_Revenue"] / summary["Total_Cost"]
-summary["CAC"] = summary["Total_Cost"] / summary["Total_New_Conv"]
 
 # ---- KPI Row ----
 
 with tab1:
     kpi1, kpi2, kpi3, kpi4 = st.columns(4)
-    
-    kpi1.metric("Total Cost (£)", f"{summary['Total_Cost'].sum():,.0f}")
-    kpi2.metric("Total Revenue (£)", f"{summary['Total_Revenue'].sum():,.0f}")
-    kpi3.metric("ROAS", f"{summary['Total_Revenue'].sum() / summary['Total_Cost'].sum():.2f}")
-    kpi4.metric("CAC (£)", f"{summary['Total_Cost'].sum() / summary['Total_New_Conv'].sum():.2f}")
+
+    totals = views.overview_totals(df)
+
+    kpi1.metric("Total Cost (£)", f"{totals['Total_Cost']:,.0f}")
+    kpi2.metric("Total Revenue (£)", f"{totals['Total_Revenue']:,.0f}")
+    kpi3.metric("ROAS", fmt(totals["ROAS"], ".2f"))
+    kpi4.metric("CAC (£)", fmt(totals["CAC"], ".2f"))
 
 with tab2:
     st.subheader("Cost vs Revenue Over Time")
@@ -59,27 +46,7 @@ with tab2:
         index=0
     )
 
-    filtered = df[df["Market"] == selected_market]
-
-    summary = (
-        filtered
-        .groupby("Date_Year_Month")
-        .agg(
-            Total_Cost=("Cost", "sum"),
-            Total_Revenue=("Fospha Attribution Revenue", "sum"),
-            Total_New_Conv=("Fospha Attribution New Conversions", "sum")
-        )
-        .reset_index()
-    )
-
-    summary["Date_Year_Month"] = pd.to_datetime(summary["Date_Year_Month"])
-    summary = summary.sort_values("Date_Year_Month")
-
-    summary["ROAS"] = summary.apply(
-        lambda x: x["Total_Revenue"] / x["Total_Cost"]
-        if x["Total_Cost"] > 0 else None,
-        axis=1
-    )
+    summary = views.monthly_summary(df, market=selected_market)
 
     fig = go.Figure()
 
@@ -121,7 +88,7 @@ with tab2:
 with tab3:
     st.subheader("Paid Social Deep Dive")
 
-    paid_social = df[df["Channel"] == "Paid Social"].copy()
+    paid_social = df[df["Channel"] == "Paid Social"]
 
     # ---- Filters (defined ONCE) ----
     col1, col2 = st.columns(2)
@@ -140,38 +107,11 @@ with tab3:
             key="ps_market"
         )
 
-    filtered = paid_social[
-        (paid_social["Date_Year_Month"] == selected_month) &
-        (paid_social["Market"] == selected_market)
-    ]
-
-    # ---- Aggregation ----
-    source_perf = (
-        filtered
-        .groupby("Source")
-        .agg(
-            Cost=("Cost", "sum"),
-            Revenue=("Fospha Attribution Revenue", "sum"),
-            Conversions=("Fospha Attribution Conversions", "sum"),
-            New_Conversions=("Fospha Attribution New Conversions", "sum")
-        )
-        .reset_index()
+    # ---- Aggregation + metrics (zero-spend sources removed) ----
+    source_perf = views.paid_social_source_performance(
+        df, month=selected_month, market=selected_market
     )
 
-    # ---- Metrics ----
-    source_perf["ROAS"] = source_perf.apply(
-        lambda x: x["Revenue"] / x["Cost"] if x["Cost"] > 0 else None,
-        axis=1
-    )
-
-    source_perf["CAC"] = source_perf.apply(
-        lambda x: x["Cost"] / x["New_Conversions"] if x["New_Conversions"] > 0 else None,
-        axis=1
-    )
-
-    # Remove zero-spend rows
-    source_perf = source_perf[source_perf["Cost"] > 0]
-
     # ---- Charts ----
     c1, c2 = st.columns(2)
 
@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+
+import views
+from metrics import safe_divide
+
+# ------------------
+# Vectorized ROAS / CAC anomaly scan over every Market x Channel x Source series
+# ------------------
+# One query sums the data per series and period; the result is laid out as
+# dense (series x period) arrays and every series is scored at once with
+# cumulative-sum rolling windows - no per-series Python loop. A period's
+# score is how many standard deviations its ROAS / CAC sits from the mean
+# of the previous `window` periods of the same series (a rolling z-score).
+SERIES_KEYS = ["Market", "Channel", "Source"]
+
+# Metric: (numerator, denominator)
+METRICS = {
+    "ROAS": ("Revenue", "Cost"),
+    "CAC": ("Cost", "New_Conversions"),
+}
+
+# Grain: trailing window (in periods) the baseline is taken over
+SCAN_WINDOWS = {"Day": 28, "Week": 8}
+SCAN_GRAINS = list(SCAN_WINDOWS)
+
+# Deviations within this fraction of the baseline never score as extreme,
+# so near-constant series don't flag on rounding noise
+MIN_REL_STD = 0.05
+
+
+def _periods(dates, grain):
+    dates = pd.to_datetime(dates)
+    if grain == "Day":
+        return dates
+    if grain == "Week":
+        return dates.dt.to_period("W").dt.start_time
+    raise ValueError(f"Unknown grain: {grain}")
+
+
+def series_matrices(data, grain="Day", **filters):
+    """
+    (series keys, periods, {measure: series x period array}) for every
+    series matching `filters`. Periods a series has no rows for are zero.
+    """
+    measures = ["Cost", "Revenue", "New_Conversions"]
+    frame = views.query(data, SERIES_KEYS + ["Date"], measures=measures, **filters)
+
+    # Integer codes for the row's series and period; no tuples are built
+    series = frame.groupby(SERIES_KEYS, observed=True, sort=True)
+    series_codes = series.ngroup().to_numpy()
+    keys = series.size().index.to_frame(index=False)
+    period_codes, periods = pd.factorize(_periods(frame["Date"], grain), sort=True)
+    shape = (len(keys), len(periods))
+    flat = series_codes * shape[1] + period_codes
+
+    arrays = {
+        m: np.bincount(flat, weights=frame[m].to_numpy("float64"),
+                       minlength=shape[0] * shape[1]).reshape(shape)
+        for m in measures
+    }
+    return keys, pd.Index(periods, name=grain), arrays
+
+
+def _trailing_sum(values, window):
+    # Sum of the previous `window` columns for every column, via one cumsum
+    cum = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(values, axis=1, out=cum[:, 1:])
+    end = np.arange(values.shape[1])
+    return cum[:, end] - cum[:, np.maximum(end - window, 0)]
+
+
+def rolling_scores(values, window=28, min_periods=7):
+    """
+    Baseline (mean), spread (std) and z-score of each value against the
+    non-NaN values among the previous `window` periods of its row. Rows are
+    independent; NaN where fewer than `min_periods` of those are present.
+    """
+    valid = ~np.isnan(values)
+    x = np.where(valid, values, 0.0)
+    n = _trailing_sum(valid.astype("float64"), window)
+    total = _trailing_sum(x, window)
+    squares = _trailing_sum(x * x, window)
+
+    enough = n >= max(min_periods, 2)
+    baseline = np.where(enough, safe_divide(total, n), np.nan)
+    var = safe_divide(squares - total * baseline, n - 1)
+    std = np.sqrt(np.clip(var, 0, None))
+    std = np.maximum(std, MIN_REL_STD * np.abs(baseline))
+    return baseline, std, safe_divide(values - baseline, std)
+
+
+def _metric_values(arrays, metric, min_cost):
+    num, den = METRICS[metric]
+    values = safe_divide(arrays[num], arrays[den])
+    # Ratios on a few pounds of spend are noise, not signal
+    values[arrays["Cost"] < min_cost] = np.nan
+    return values
+
+
+def scan(data, grain="Day", window=None, threshold=3.0, min_cost=50.0,
+         metrics=tuple(METRICS), **filters):
+    """
+    Every (series, period, metric) whose |score| is at least `threshold`,
+    largest deviation first. `window` defaults to SCAN_WINDOWS[grain].
+    """
+    window = window or SCAN_WINDOWS.get(grain)
+    keys, periods, arrays = series_matrices(data, grain, **filters)
+    found = []
+    for metric in metrics:
+        values = _metric_values(arrays, metric, min_cost)
+        baseline, _, score = rolling_scores(values, window, min_periods=window // 2)
+        rows, cols = np.nonzero(np.abs(np.nan_to_num(score)) >= threshold)
+        found.append(keys.iloc[rows].reset_index(drop=True).assign(**{
+            grain: periods[cols],
+            "Metric": metric,
+            "Value": values[rows, cols],
+            "Baseline": baseline[rows, cols],
+            "Score": score[rows, cols],
+            "Cost": arrays["Cost"][rows, cols],
+        }))
+    flags = pd.concat(found, ignore_index=True)
+    order = np.argsort(-np.abs(flags["Score"].to_numpy()), kind="stable")
+    return flags.iloc[order].reset_index(drop=True)
+
+
+def flagged_series(flags, grain="Day"):
+    """One row per flagged (series, metric): flag count, latest flag and worst score."""
+    by = SERIES_KEYS + ["Metric"]
+    # scan() sorts by |Score|, so each group's first row is its worst
+    worst = flags.drop_duplicates(by)[by + ["Score"]].rename(columns={"Score": "Worst_Score"})
+    counts = (
+        flags.groupby(by, observed=True)
+        .agg(Flags=("Score", "size"), Latest=(grain, "max"))
+        .reset_index()
+    )
+    return worst.merge(counts, on=by)[by + ["Flags", "Latest", "Worst_Score"]]
+
+
+def series_detail(data, market, channel, source, metric="ROAS", grain="Day",
+                  window=None, threshold=3.0, min_cost=50.0):
+    """One series' metric per period with its baseline band and flags, for charting."""
+    window = window or SCAN_WINDOWS.get(grain)
+    _, periods, arrays = series_matrices(
+        data, grain, Market=market, Channel=channel, Source=source
+    )
+    values = _metric_values(arrays, metric, min_cost)
+    baseline, std, score = rolling_scores(values, window, min_periods=window // 2)
+    detail = pd.DataFrame({
+        grain: periods,
+        metric: values.reshape(-1),
+        "Baseline": baseline.reshape(-1),
+        "Lower": (baseline - threshold * std).reshape(-1),
+        "Upper": (baseline + threshold * std).reshape(-1),
+        "Score": score.reshape(-1),
+    })
+    detail["Flagged"] = detail["Score"].abs() >= threshold
+    return detail
@@ -0,0 +1,170 @@
+import argparse
+import hashlib
+import json
+import logging
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+import views
+from cube import AGG_MEASURES, CubeIndex
+from filter_cache import FilterCache
+from ingest import SOURCE_CSV
+from metrics import add_metrics
+from sources import load_data
+
+# ------------------
+# Local JSON metrics API
+# ------------------
+#   GET /metrics?by=Channel&market=UK&from=202507&to=202509&channel=Paid+Social
+#   GET /months
+#   GET /health
+#
+# Filters take one value, a comma-separated list or a repeated parameter;
+# `from` / `to` bound the YYYYMM month range (inclusive). Every response
+# carries an ETag hashed from its body, and bodies are cached by filter
+# state, so a poll with a matching If-None-Match gets a 304 without
+# recomputing anything. Binds to localhost only by default.
+logger = logging.getLogger(__name__)
+
+FILTERS = {"market": "Market", "channel": "Channel", "source": "Source", "brand": "Brand"}
+GROUP_BY = {"Market", "Channel", "Source", "Month", "Brand"}
+# Summed measures (and the derived Returning_Conversions) go out to the penny
+# or hundredth, as the inputs were; float32 sums otherwise leak noise digits
+ROUNDED = list(AGG_MEASURES) + ["Returning_Conversions"]
+
+
+def _etag_matches(header, etag):
+    # If-None-Match is "*" or a comma-separated list of (possibly weak) tags
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == "*" or tag == etag:
+            return True
+    return False
+
+
+class MetricsService:
+    def __init__(self, cube):
+        self.index = CubeIndex(cube)
+        self.months = views.available_months(cube)
+        self.columns = set(cube.columns)
+        self.token = cube.attrs.get("token") or int(
+            pd.util.hash_pandas_object(cube, index=False).sum()
+        )
+        self.cache = FilterCache(max_entries=1024)
+        self.cache.bind(self.token)
+
+    def parse(self, query):
+        """Validated (by, filters) from a parsed query string; ValueError on bad input."""
+        params = {key: [v for value in values for v in value.split(",") if v]
+                  for key, values in query.items()}
+        unknown = set(params) - set(FILTERS) - {"by", "from", "to"}
+        if unknown:
+            raise ValueError(f"Unknown parameter(s): {', '.join(sorted(unknown))}")
+
+        # Each column once, first mention wins: grouping by one twice is an error
+        by = list(dict.fromkeys(params.get("by", ["Channel"])))
+        bad = [col for col in by if col not in GROUP_BY or col not in self.columns]
+        if bad:
+            raise ValueError(f"Can't group by: {', '.join(bad)}")
+
+        filters = {FILTERS[key]: values for key, values in params.items() if key in FILTERS}
+        if "Brand" in filters and "Brand" not in self.columns:
+            raise ValueError("This dataset has no Brand column")
+        if "from" in params or "to" in params:
+            try:
+                lo = int(params.get("from", [0])[0])
+                hi = int(params.get("to", [999999])[0])
+            except ValueError:
+                raise ValueError("from / to must be YYYYMM months") from None
+            filters["Month"] = [m for m in self.months if lo <= m <= hi]
+        return by, filters
+
+    def _compute(self, by, **filters):
+        frame = add_metrics(views.query(self.index, by, **filters), decimals=4)
+        frame = frame.round({col: 2 for col in ROUNDED})
+        body = json.dumps({
+            "by": by,
+            "filters": filters,
+            "rows": json.loads(frame.to_json(orient="records")),
+        }).encode()
+        return body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+    def metrics(self, by, filters):
+        """(JSON body, ETag) for one filter combination, cached by filter state."""
+        return self.cache.get_or_compute(
+            ("metrics", tuple(by)), partial(self._compute, by), **filters
+        )
+
+
+def _handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body=b"", etag=None):
+            self.send_response(status)
+            if etag:
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")
+            if status != 304:
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if status != 304:
+                self.wfile.write(body)
+
+        def _error(self, status, message):
+            self._send(status, json.dumps({"error": message}).encode())
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/health":
+                return self._send(200, json.dumps({"status": "ok"}).encode())
+            if url.path == "/months":
+                return self._send(200, json.dumps({"months": service.months}).encode())
+            if url.path != "/metrics":
+                return self._error(404, f"No such endpoint: {url.path}")
+
+            try:
+                by, filters = service.parse(parse_qs(url.query))
+            except ValueError as e:
+                return self._error(400, str(e))
+            try:
+                body, etag = service.metrics(by, filters)
+            except Exception:
+                logger.exception("Failed to compute %s", self.path)
+                return self._error(500, "Internal error computing metrics")
+            if _etag_matches(self.headers.get("If-None-Match", ""), etag):
+                return self._send(304, etag=etag)
+            self._send(200, body, etag)
+
+        def log_message(self, format, *args):
+            logger.info("%s - %s", self.address_string(), format % args)
+
+    return Handler
+
+
+def make_server(cube, host="127.0.0.1", port=8502):
+    """A threaded HTTP server over `cube`; call serve_forever() to start it."""
+    return ThreadingHTTPServer((host, port), _handler(MetricsService(cube)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve dashboard metrics as JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--csv", default=SOURCE_CSV, help="single export to load")
+    parser.add_argument("--sources", help="directory or glob of exports (see sources.py)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    server = make_server(load_data(args.csv, args.sources), args.host, args.port)
+    print(f"serving metrics on http://{args.host}:{args.port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+import anomalies
+import response
+import views
+from cube import CubeIndex, build_cube
+from ingest import SOURCE_CSV, apply_schema, load_frame, parse_csv
+from periods import month_key
+from synthetic import BASE_SOURCES, generate
+
+# ------------------
+# Scaling benchmark for the dashboard pipeline
+# ------------------
+# For each scale: generate a synthetic export, then time every stage -
+# CSV parse, schema coercion, snapshot write/read, cube build, each tab's
+# filter/groupby/metric step and (with --render) a full Streamlit render
+# of each view including figure construction. Results are JSON lines so
+# runs from different releases can be diffed.
+
+
+def _paid_channel_deep_dive(data):
+    months = views.available_months(data)
+    return (
+        views.paid_channel_deep_dive(data, months),
+        views.paid_channel_time_series(data, months, views.PAID_CHANNELS),
+    )
+
+
+def _paid_social_deep_dive(data):
+    months = views.available_months(data)
+    return (
+        views.paid_social_deep_dive(data, months),
+        views.paid_social_time_series(data, months, BASE_SOURCES["Paid Social"]),
+    )
+
+
+def _budget(data):
+    curves = response.fit_curves(data)
+    return response.optimize(curves, curves["Current_Spend"].sum())
+
+
+# Each tab of Fospha.py at its default filter state
+VIEW_QUERIES = {
+    "Task 4": views.channel_roas,
+    "Task 5": views.paid_social_roas,
+    "Task 6": views.paid_social_sources,
+    "Task 7": views.market_cost_revenue,
+    "Bonus Task 1": _paid_channel_deep_dive,
+    "Bonus Task 2": _paid_social_deep_dive,
+    "Anomalies": anomalies.scan,
+    "Budget": _budget,
+}
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# What Fospha.py pulls in before first paint, plus the deferred plotting libs
+IMPORTS = [
+    "streamlit", "pandas", "numpy", "pyarrow", "plotly.express",
+    "plotly.graph_objects", "PIL.Image", "views", "sources", "shared", "store",
+]
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timed(fn, *args, trace=True, **kwargs):
+    """
+    Run fn, returning (result, seconds, peak traced MB). Tracing slows
+    Python-heavy code down a lot, so it's skipped (peak None) with trace=False.
+    """
+    if not trace:
+        start = time.perf_counter()
+        return fn(*args, **kwargs), time.perf_counter() - start, None
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def _rows(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, tuple):
+        return sum(_rows(v) for v in value)
+    return None
+
+
+def bench_pipeline(csv_path, work_dir):
+    """Time each pipeline stage on one export; yields result records."""
+    raw, seconds, peak = timed(parse_csv, csv_path)
+    yield {"stage": "csv_parse", "seconds": seconds, "peak_mb": peak, "rows_out": len(raw)}
+
+    df, seconds, peak = timed(apply_schema, raw)
+    yield {"stage": "coerce", "seconds": seconds, "peak_mb": peak, "rows_out": len(df)}
+    del raw
+
+    cache_dir = os.path.join(work_dir, "cache")
+    _, seconds, peak = timed(load_frame, csv_path, cache_dir)
+    yield {"stage": "snapshot_build", "seconds": seconds, "peak_mb": peak}
+    _, seconds, peak = timed(load_frame, csv_path, cache_dir)
+    yield {"stage": "snapshot_read", "seconds": seconds, "peak_mb": peak}
+
+    cube, seconds, peak = timed(build_cube, df)
+    yield {"stage": "cube_build", "seconds": seconds, "peak_mb": peak,
+           "rows_in": len(df), "rows_out": len(cube)}
+    del df
+
+    months, seconds, peak = timed(lambda: month_key(cube["Date"]))
+    yield {"stage": "month_key", "seconds": seconds, "peak_mb": peak, "rows_in": len(cube)}
+    cube["Month"] = months
+
+    for view, view_query in VIEW_QUERIES.items():
+        result, seconds, peak = timed(view_query, cube)
+        yield {"stage": f"view:{view}", "seconds": seconds, "peak_mb": peak,
+               "rows_in": len(cube), "rows_out": _rows(result)}
+
+    index, seconds, peak = timed(CubeIndex, cube)
+    yield {"stage": "index_build", "seconds": seconds, "peak_mb": peak, "rows_in": len(cube)}
+    for view, view_query in VIEW_QUERIES.items():
+        result, seconds, peak = timed(view_query, index)
+        yield {"stage": f"view_indexed:{view}", "seconds": seconds, "peak_mb": peak,
+               "rows_in": len(cube), "rows_out": _rows(result)}
+
+    partials, seconds, peak = timed(views.rollups, cube)
+    yield {"stage": "rollups", "seconds": seconds, "peak_mb": peak,
+           "rows_in": len(cube), "rows_out": _rows(tuple(partials.values()))}
+    months = views.available_months(cube)
+    for view, name, deep_dive in [
+        ("Bonus Task 1", "paid_channel", views.paid_channel_deep_dive),
+        ("Bonus Task 2", "paid_social", views.paid_social_deep_dive),
+    ]:
+        result, seconds, peak = timed(deep_dive, partials[name], months)
+        yield {"stage": f"kpi:{view}", "seconds": seconds, "peak_mb": peak,
+               "rows_in": len(partials[name]), "rows_out": _rows(result)}
+
+
+def bench_render(csv_path, work_dir, timeout=600):
+    """
+    Render Fospha.py headlessly with Streamlit's AppTest and time each
+    view: filter/groupby, Styler, figure construction and serialization.
+    """
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    # Caches are per process - don't let a previous scale's data leak in
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+    app_dir = os.path.join(work_dir, "app")
+    os.makedirs(app_dir, exist_ok=True)
+    os.symlink(os.path.abspath(csv_path), os.path.join(app_dir, SOURCE_CSV))
+    shutil.copy(os.path.join(HERE, "fospha_logo.png"), app_dir)
+
+    cwd = os.getcwd()
+    os.chdir(app_dir)
+    try:
+        at = AppTest.from_file(os.path.join(HERE, "Fospha.py"), default_timeout=timeout)
+        _, seconds, _ = timed(at.run, trace=False)
+        yield {"stage": "render:first_load", "seconds": seconds}
+        for view in at.radio(key="view").options:
+            _, seconds, _ = timed(at.radio(key="view").set_value(view).run, trace=False)
+            yield {"stage": f"render:{view}", "seconds": seconds,
+                   "errors": [str(e.value) for e in at.exception]}
+    finally:
+        os.chdir(cwd)
+
+
+def bench_imports(modules=IMPORTS):
+    """
+    Cold import time of each module, each in a fresh interpreter, from
+    python -X importtime (cumulative, so including its dependencies).
+    """
+    for module in modules:
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=HERE, capture_output=True, text=True
+        )
+        cumulative = None
+        for line in proc.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            parts = line.split("|")
+            if line.startswith("import time:") and parts[-1].strip() == module:
+                cumulative = int(parts[1]) / 1e6
+        yield {"stage": f"import:{module}", "seconds": cumulative,
+               "ok": proc.returncode == 0}
+
+
+def run(scales, out, markets=3, channels=6, sources=4, days=153, render=False, keep=False):
+    meta = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "markets": markets,
+        "channels": channels,
+        "sources_per_channel": sources,
+        "days": days,
+    }
+    for rows in scales:
+        work_dir = tempfile.mkdtemp(prefix=f"fospha-bench-{rows}-")
+        try:
+            csv_path = os.path.join(work_dir, "export.csv")
+            _, seconds, _ = timed(
+                generate, csv_path, rows, trace=False,
+                markets=markets, channels=channels,
+                sources_per_channel=sources, days=days
+            )
+            records = [{"stage": "generate", "seconds": seconds,
+                        "file_mb": os.path.getsize(csv_path) / 1e6}]
+            records += bench_pipeline(csv_path, work_dir)
+            if render:
+                records += bench_render(csv_path, work_dir)
+            for record in records:
+                line = json.dumps({**meta, "rows": rows, **record})
+                print(line)
+                out.write(line + "\n")
+                out.flush()
+        finally:
+            if not keep:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard pipeline at scale.")
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+        help="one or more dataset sizes (up to 50M)"
+    )
+    parser.add_argument("--markets", type=int, default=3)
+    parser.add_argument("--channels", type=int, default=6)
+    parser.add_argument("--sources", type=int, default=4, help="sources per channel")
+    parser.add_argument("--days", type=int, default=153)
+    parser.add_argument("--render", action="store_true",
+                        help="also time full Streamlit renders of each view")
+    parser.add_argument("--keep", action="store_true", help="keep generated files")
+    parser.add_argument("--imports", action="store_true",
+                        help="only report cold import times of the app's dependencies")
+    parser.add_argument("--out", default="bench_results.jsonl")
+    args = parser.parse_args()
+
+    with open(args.out, "a") as out:
+        if args.imports:
+            meta = {"revision": _git_revision(), "python": platform.python_version()}
+            for record in bench_imports():
+                line = json.dumps({**meta, **record})
+                print(line)
+                out.write(line + "\n")
+            sys.exit()
+        run(
+            args.rows, out,
+            markets=args.markets,
+            channels=args.channels,
+            sources=args.sources,
+            days=args.days,
+            render=args.render,
+            keep=args.keep
+        )
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+from ingest import DIMENSIONS, MEASURES, concat_frames
+
+# ------------------
+# Daily Date x Market x Channel x Source cube
+# ------------------
+# Every tab is a filtered sum over these four additive measures, so
+# answering from the cube gives the same numbers as the row-level frame
+# at a fraction of the rows.
+CUBE_KEYS = ["Date"] + DIMENSIONS
+
+# Names the tabs use for the summed measures
+AGG_MEASURES = {
+    "Cost": "Cost",
+    "Revenue": "Fospha Attribution Revenue",
+    "New_Conversions": "Fospha Attribution New Conversions",
+    "Total_Conversions": "Fospha Attribution Conversions",
+}
+
+
+def build_cube(df):
+    """Sum the row-level export down to one row per day and dimension combo."""
+    cube = (
+        df
+        .groupby(CUBE_KEYS, observed=True, sort=True)[MEASURES]
+        .sum()
+        .reset_index()
+    )
+    cube[MEASURES] = cube[MEASURES].astype("float64")
+    return cube
+
+
+def fold_cube(frames, cube=None):
+    """
+    Fold an iterable of row-level frames into a cube one frame at a time,
+    so only one frame plus the running cube is ever held in memory.
+    """
+    for frame in frames:
+        part = build_cube(frame)
+        cube = part if cube is None else build_cube(concat_frames([cube, part]))
+    return cube
+
+
+def _slice(cube, filters):
+    mask = None
+    for col, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            cond = cube[col].isin(value)
+        else:
+            cond = cube[col] == value
+        mask = cond if mask is None else mask & cond
+    return cube if mask is None else cube[mask]
+
+
+class CubeIndex:
+    """
+    Inverted index over a cube: for each dimension value, the sorted row
+    positions holding it. A filter combination is answered by unioning the
+    position lists within a column, intersecting across columns (smallest
+    first) and taking those rows, so its cost follows the number of
+    matching rows rather than the size of the cube.
+    """
+
+    COLUMNS = DIMENSIONS + ["Month", "Brand"]
+
+    def __init__(self, cube, columns=None, arrays=None):
+        self.cube = cube
+        if arrays is None:
+            columns = columns or [c for c in self.COLUMNS if c in cube.columns]
+            arrays = {col: self._build(cube[col]) for col in columns}
+        # {col: (values, order, bounds)}: the postings of values[i] are
+        # order[bounds[i]:bounds[i + 1]] - flat arrays, so they can be
+        # saved and memory-mapped (see shared.py) as well as built here
+        self.arrays = arrays
+        self._postings = {
+            col: dict(zip(values, np.split(order, bounds[1:-1])))
+            for col, (values, order, bounds) in arrays.items()
+        }
+
+    @staticmethod
+    def _build(column):
+        dtype = np.int32 if len(column) < 2**31 else np.int64
+        codes, values = pd.factorize(column)
+        order = np.argsort(codes, kind="stable").astype(dtype)
+        # Missing values (code -1) sort first; they match no filter
+        order = order[np.count_nonzero(codes < 0):]
+        counts = np.bincount(codes[codes >= 0], minlength=len(values))
+        bounds = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return values.tolist(), order, bounds
+
+    def __len__(self):
+        return len(self.cube)
+
+    def positions(self, col, value):
+        """Sorted row positions where `col` equals value (or any of a list of values)."""
+        postings = self._postings[col]
+        empty = np.empty(0, dtype=np.int32)
+        if not isinstance(value, (list, tuple, set)):
+            return postings.get(value, empty)
+        parts = [postings.get(v, empty) for v in set(value)]
+        if len(parts) == 1:
+            return parts[0]
+        # Each row holds one value per column, so the parts are disjoint
+        return np.sort(np.concatenate(parts)) if parts else empty
+
+    def select(self, **filters):
+        """Rows of the cube matching the filters, as aggregate() would slice them."""
+        indexed = [c for c in filters if c in self._postings]
+        if not indexed:
+            return _slice(self.cube, filters)
+
+        lists = sorted((self.positions(c, filters[c]) for c in indexed), key=len)
+        rows = lists[0]
+        for other in lists[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        rest = {c: v for c, v in filters.items() if c not in self._postings}
+        return _slice(self.cube.take(rows), rest)
+
+
+def rollup(cube, keys, **filters):
+    """
+    Pre-summed partials of the (filtered) cube by `keys`. Same columns as
+    the cube minus the ones summed away, so it's a drop-in - and much
+    smaller - input for any query that only filters and groups on `keys`.
+    """
+    return (
+        _slice(cube, filters)
+        .groupby(keys, observed=True, sort=True)[MEASURES]
+        .sum()
+        .reset_index()
+    )
+
+
+def aggregate(cube, by=None, measures=None, **filters):
+    """
+    Filter the cube and sum it by the given column(s) - the one query every
+    tab makes. Filters map a column to a value or a list of allowed values;
+    measures picks from AGG_MEASURES (default: all). With no `by` the result
+    is a single row of grand totals.
+    """
+    measures = measures or list(AGG_MEASURES)
+    sliced = _slice(cube, filters)
+
+    if by is None:
+        return pd.DataFrame(
+            {name: [sliced[AGG_MEASURES[name]].sum()] for name in measures}
+        )
+    spec = {name: (AGG_MEASURES[name], "sum") for name in measures}
+    return sliced.groupby(by, observed=True).agg(**spec).reset_index()
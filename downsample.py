@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+# ------------------
+# Shape-preserving downsampling for time charts
+# ------------------
+# Largest-Triangle-Three-Buckets (Steinarsson, 2013): keep the first and
+# last point, split the rest into equal buckets and from each keep the
+# point forming the largest triangle with the previously kept point and
+# the next bucket's mean. Peaks and troughs survive, so a multi-year daily
+# series keeps its shape while the figure payload stays bounded.
+MAX_POINTS = 1000
+
+
+def _numeric(x):
+    x = pd.Series(x)
+    if pd.api.types.is_datetime64_any_dtype(x):
+        return x.astype("int64").to_numpy(dtype=float)
+    if pd.api.types.is_numeric_dtype(x):
+        return x.to_numpy(dtype=float)
+    # Categories / labels: evenly spaced, in the order given
+    return np.arange(len(x), dtype=float)
+
+
+def lttb(x, y, threshold=MAX_POINTS):
+    """Positions of the points LTTB keeps from (x, y); all of them if len <= threshold."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = _numeric(x)
+    # Missing values (e.g. ROAS with no spend) don't pull the selection around
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+
+    keep = np.empty(threshold, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(hi, edges[i + 2]) if i + 2 < len(edges) else slice(n - 1, n)
+        cx, cy = x[nxt].mean(), y[nxt].mean()
+        # Twice the triangle area for every candidate in the bucket at once
+        area = np.abs(
+            (x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a])
+        )
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(frame, x, y, max_points=MAX_POINTS):
+    """Rows of `frame` LTTB keeps for the series frame[y] over frame[x]."""
+    if len(frame) <= max_points:
+        return frame
+    return frame.iloc[lttb(frame[x], frame[y], max_points)]
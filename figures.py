@@ -0,0 +1,345 @@
+import plotly.express as px
+import plotly.graph_objects as go
+
+from downsample import downsample
+from metrics import NA_REP
+
+# ------------------
+# Figure and table builders shared by Fospha.py and report.py
+# ------------------
+# Each takes a view's output (see views.py) and returns a plotly Figure or
+# a pandas Styler, so the dashboard and the batch report draw the same
+# thing. Over-time builders expect month keys already labelled
+# (periods.label_periods) and downsample long Day/Week series themselves.
+LEGEND = dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+
+METRIC_FORMATS = {
+    "Cost": "£{:,.0f}",
+    "Revenue": "£{:,.0f}",
+    "ROAS": "{:.2f}",
+    "CAC": "£{:,.2f}",
+    "CPP": "£{:,.2f}",
+    "AOV": "£{:,.2f}"
+}
+
+
+# ------------------
+# Tables
+# ------------------
+def channel_roas_table(channel_pivot):
+    """Task 4 table with readable conversion column names."""
+    display_table = channel_pivot.rename(
+        columns={
+            "New_Conversions": "New Conversions",
+            "Returning_Conversions": "Returning Conversions"
+        }
+    )
+    return display_table[[
+        "Channel",
+        "Cost",
+        "Revenue",
+        "ROAS",
+        "CAC",
+        "CPP",
+        "AOV",
+        "New Conversions",
+        "Returning Conversions"
+    ]].style.format({
+        **METRIC_FORMATS,
+        "New Conversions": "{:.2f}",
+        "Returning Conversions": "{:.2f}"
+    }, na_rep=NA_REP)
+
+
+def metrics_table(pivot, key):
+    """Deep-dive metrics table for one row per `key` (Channel or Source)."""
+    return pivot[[
+        key, "Cost", "Revenue", "ROAS", "CAC", "CPP", "AOV",
+        "New_Conversions", "Returning_Conversions"
+    ]].style.format(METRIC_FORMATS, na_rep=NA_REP)
+
+
+# ------------------
+# Charts
+# ------------------
+def channel_roas_bar(channel_pivot):
+    """Task 4: ROAS per paid channel."""
+    # Chart stays simple (ROAS only)
+    return px.bar(
+        channel_pivot,
+        x="Channel",
+        y="ROAS",
+        title="Return on Advertising Spend by Paid Channel"
+    )
+
+
+def paid_social_roas_line(pivot, grain):
+    """Task 5: Paid Social ROAS over time."""
+    return px.line(
+        downsample(pivot, grain, "ROAS"),
+        x=grain,
+        y="ROAS",
+        markers=True,
+        render_mode="webgl",
+        title="Paid Social ROAS Over Time"
+    )
+
+
+def source_cost_cac(source_pivot, title):
+    """Task 6: Paid Social cost (bars) and CAC (line, right axis) by source."""
+    fig = go.Figure()
+
+    # Cost (bars, left axis)
+    fig.add_trace(
+        go.Bar(
+            x=source_pivot["Source"],
+            y=source_pivot["Cost"],
+            name="Cost",
+            yaxis="y1"
+        )
+    )
+
+    # CAC (line, right axis)
+    fig.add_trace(
+        go.Scatter(
+            x=source_pivot["Source"],
+            y=source_pivot["CAC"],
+            name="CAC",
+            yaxis="y2",
+            mode="lines+markers"
+        )
+    )
+
+    fig.update_layout(
+        title=title,
+        xaxis_title="Source",
+        yaxis=dict(title="Cost"),
+        yaxis2=dict(
+            title="CAC",
+            overlaying="y",
+            side="right"
+        ),
+        legend=LEGEND
+    )
+    return fig
+
+
+def market_cost_revenue_lines(pivot, grain, market="UK"):
+    """Task 7: one market's cost (left axis) and revenue (right axis) over time."""
+    cost = downsample(pivot, grain, "Cost")
+    revenue = downsample(pivot, grain, "Revenue")
+    fig = go.Figure()
+
+    # Cost (left axis)
+    fig.add_trace(
+        go.Scattergl(
+            x=cost[grain],
+            y=cost["Cost"],
+            name="Cost",
+            mode="lines+markers",
+            yaxis="y1",
+            line=dict(color="red")
+        )
+    )
+
+    # Revenue (right axis)
+    fig.add_trace(
+        go.Scattergl(
+            x=revenue[grain],
+            y=revenue["Revenue"],
+            name="Revenue",
+            mode="lines+markers",
+            yaxis="y2",
+            line=dict(color="green")
+        )
+    )
+
+    fig.update_layout(
+        title=f"{market} Cost & Revenue Over Time",
+        xaxis_title=grain,
+        height=600,
+        yaxis=dict(title="Cost"),
+        yaxis2=dict(
+            title="Revenue",
+            overlaying="y",
+            side="right"
+        ),
+        legend=LEGEND
+    )
+    return fig
+
+
+def cost_vs_revenue(pivot, grain, title):
+    """Bonus Tasks: cost vs revenue over time on two axes."""
+    cost = downsample(pivot, grain, "Cost")
+    revenue = downsample(pivot, grain, "Revenue")
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        x=cost[grain], y=cost["Cost"], mode="lines+markers", name="Cost", yaxis="y1"
+    ))
+    fig.add_trace(go.Scattergl(
+        x=revenue[grain], y=revenue["Revenue"], mode="lines+markers", name="Revenue", yaxis="y2"
+    ))
+    fig.update_layout(
+        title=title,
+        xaxis_title=grain,
+        yaxis=dict(title="Cost (£)"),
+        yaxis2=dict(title="Revenue (£)", overlaying="y", side="right"),
+        legend=LEGEND,
+        template="plotly_white"
+    )
+    return fig
+
+
+def channel_efficiency(channel_pivot):
+    """Bonus Task 1: ROAS vs CAC per channel, bubble size = spend."""
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scatter(
+            x=channel_pivot["CAC"],
+            y=channel_pivot["ROAS"],
+            mode="markers+text",
+            text=channel_pivot["Channel"],
+            textposition="top center",
+            marker=dict(size=channel_pivot["Cost"] / 1000, sizemode="area", sizeref=2),
+            name="Channel"
+        )
+    )
+
+    fig.update_layout(
+        title="Paid Channel Efficiency (ROAS vs CAC, bubble size = spend)",
+        xaxis_title="CAC (£)",
+        yaxis_title="ROAS",
+        template="plotly_white"
+    )
+    return fig
+
+
+def new_vs_returning(pivot, key, title):
+    """Bonus Tasks: new vs returning conversions per `key`, stacked."""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=pivot[key],
+        y=pivot["New_Conversions"],
+        name="New Conversions"
+    ))
+    fig.add_trace(go.Bar(
+        x=pivot[key],
+        y=pivot["Returning_Conversions"],
+        name="Returning Conversions"
+    ))
+    fig.update_layout(
+        title=title,
+        barmode="stack",
+        xaxis_title=key,
+        yaxis_title="Conversions",
+        template="plotly_white"
+    )
+    return fig
+
+
+def source_cost_cac_dive(source_pivot):
+    """Bonus Task 2: cost vs CAC by source, Pinterest last."""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=source_pivot["Source"],
+        y=source_pivot["Cost"],
+        name="Cost",
+        yaxis="y1"
+    ))
+    fig.add_trace(go.Scatter(
+        x=source_pivot["Source"],
+        y=source_pivot["CAC"],
+        name="CAC",
+        yaxis="y2",
+        mode="lines+markers"
+    ))
+    fig.update_layout(
+        title="Paid Social Cost & CAC by Source",
+        xaxis_title="Source",
+        yaxis=dict(title="Cost (£)"),
+        yaxis2=dict(title="CAC (£)", overlaying="y", side="right"),
+        legend=LEGEND,
+        template="plotly_white"
+    )
+    return fig
+
+
+def anomaly_band(detail, grain, metric, title):
+    """Anomalies: one series' metric against its rolling baseline band, flags marked."""
+    flagged = detail[detail["Flagged"]]
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        x=detail[grain], y=detail["Upper"], mode="lines", line=dict(width=0),
+        showlegend=False, hoverinfo="skip"
+    ))
+    fig.add_trace(go.Scattergl(
+        x=detail[grain], y=detail["Lower"], mode="lines", line=dict(width=0),
+        fill="tonexty", fillcolor="rgba(128, 128, 128, 0.2)", name="Expected range"
+    ))
+    fig.add_trace(go.Scattergl(
+        x=detail[grain], y=detail["Baseline"], mode="lines",
+        line=dict(dash="dash", color="grey"), name="Baseline"
+    ))
+    fig.add_trace(go.Scattergl(
+        x=detail[grain], y=detail[metric], mode="lines+markers", name=metric
+    ))
+    fig.add_trace(go.Scattergl(
+        x=flagged[grain], y=flagged[metric], mode="markers",
+        marker=dict(color="red", size=10, symbol="x"), name="Flagged"
+    ))
+    fig.update_layout(
+        title=title,
+        xaxis_title=grain,
+        yaxis_title=metric,
+        legend=LEGEND,
+        template="plotly_white"
+    )
+    return fig
+
+
+def response_curves(points, plan, level, target="Revenue"):
+    """Budget: each series' fitted response curve, current and optimal spend marked."""
+    fig = px.line(
+        points, x="Spend", y=target, color=level,
+        title=f"Daily {target.replace('_', ' ')} Response to Daily Spend by {level}"
+    )
+    for name, symbol in [("Current", "circle-open"), ("Optimal", "star")]:
+        fig.add_trace(go.Scatter(
+            x=plan[f"{name}_Spend"], y=plan[f"{name}_{target}"], mode="markers",
+            text=plan[level], marker=dict(symbol=symbol, size=12, color="black"),
+            name=f"{name} spend"
+        ))
+    fig.update_layout(
+        xaxis_title="Daily Spend (£)",
+        legend=LEGEND,
+        template="plotly_white"
+    )
+    return fig
+
+
+def budget_split(plan, level):
+    """Budget: current vs optimal daily spend per series."""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=plan[level], y=plan["Current_Spend"], name="Current"))
+    fig.add_trace(go.Bar(x=plan[level], y=plan["Optimal_Spend"], name="Optimal"))
+    fig.update_layout(
+        title=f"Current vs Optimal Daily Spend by {level}",
+        barmode="group",
+        xaxis_title=level,
+        yaxis_title="Daily Spend (£)",
+        legend=LEGEND,
+        template="plotly_white"
+    )
+    return fig
+
+
+def budget_table(plan):
+    """Budget: the optimizer's per-series plan, formatted."""
+    money = [c for c in plan.columns if c.endswith(("Spend", "Revenue")) or c == "Change"]
+    conversions = [c for c in plan.columns if c.endswith("New_Conversions")]
+    return plan.style.format({
+        **{c: "£{:,.0f}" for c in money},
+        **{c: "{:,.1f}" for c in conversions},
+        "Marginal_ROAS": "{:.2f}"
+    }, na_rep=NA_REP)
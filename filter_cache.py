@@ -0,0 +1,103 @@
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# ------------------
+# Bounded LRU cache for filtered views
+# ------------------
+# Keyed by (view name, normalized filter state), so ["Jul", "Jun"] and
+# ["Jun", "Jul"] share an entry. Bounded both by entry count and by the
+# approximate size of the cached frames; least recently used goes first.
+
+
+def _normalize(value):
+    if isinstance(value, (list, tuple, set, frozenset, pd.Index)):
+        return tuple(sorted({_normalize(v) for v in value}, key=repr))
+    return value
+
+
+def signature(name, **filters):
+    """Order-independent, hashable key for a view + its filter state."""
+    return (name, tuple(sorted((k, _normalize(v)) for k, v in filters.items())))
+
+
+def _nbytes(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    return sys.getsizeof(value)
+
+
+class FilterCache:
+    def __init__(self, max_entries=256, max_bytes=256_000_000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._token = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def bind(self, token):
+        """Drop every entry when the underlying dataset changes."""
+        with self._lock:
+            if token != self._token:
+                self._entries.clear()
+                self._bytes = 0
+                self._token = token
+
+    def get_or_compute(self, name, compute, with_status=False, **filters):
+        """
+        Return the cached result of compute(**filters) for this view, computing
+        and storing it on a miss. Results are shared - callers mustn't mutate them.
+
+        With with_status=True returns (result, hit) instead.
+        """
+        key = signature(name, **filters)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                result = self._entries[key][0]
+                return (result, True) if with_status else result
+            self.misses += 1
+
+        result = compute(**filters)
+        size = _nbytes(result)
+
+        with self._lock:
+            if key not in self._entries and size <= self.max_bytes:
+                self._store(key, result, size)
+        return (result, False) if with_status else result
+
+    def _store(self, key, result, size):
+        # Caller holds the lock
+        self._entries[key] = (result, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import logging
+import os
+import uuid
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# ------------------
+# Source export + snapshot locations
+# ------------------
+SOURCE_CSV = "Fospha Data 2.csv"
+CACHE_DIR = ".fospha_cache"
+
+# Bump when the snapshot layout changes so old snapshots get rebuilt
+SNAPSHOT_VERSION = 3
+
+_HASH_BLOCK = 1 << 20
+
+logger = logging.getLogger(__name__)
+
+# ------------------
+# Declared schema - anything not listed here is dropped on load
+# ------------------
+DIMENSIONS = ["Market", "Channel", "Source"]
+
+# Blank dimension values become this category rather than NaN, so the rows
+# stay in every groupby and filter instead of silently dropping out of totals
+MISSING = "(missing)"
+
+MEASURES = [
+    "Cost",
+    "Fospha Attribution Conversions",
+    "Fospha Attribution Revenue",
+    "Fospha Attribution New Conversions"
+]
+
+SCHEMA = {
+    "Date": "datetime64[ns]",
+    **{col: "category" for col in DIMENSIONS},
+    **{col: "float32" for col in MEASURES},
+}
+
+
+def _file_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _snapshot_paths(path, cache_dir):
+    # Keyed on the absolute path too: same-named exports in different
+    # directories must not share a snapshot
+    stem = os.path.splitext(os.path.basename(path))[0].replace(" ", "_")
+    key = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=4).hexdigest()
+    base = os.path.join(cache_dir, f"{stem}-{key}")
+    return base + ".parquet", base + ".json"
+
+
+def _replace_via_tmp(path, write):
+    # A private temp name per writer, so concurrent builders never write
+    # into (or delete) each other's half-written file
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(meta_path, meta):
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+    _replace_via_tmp(meta_path, write)
+
+
+def _read_snapshot(snap_path):
+    try:
+        return pd.read_parquet(snap_path)
+    except (OSError, ValueError) as e:
+        # e.g. truncated by an interrupted write - rebuild rather than fail forever
+        logger.warning("Snapshot %s is unreadable (%s); rebuilding it", snap_path, e)
+        return None
+
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def apply_schema(df):
+    """
+    Coerce a raw export frame to SCHEMA, dropping undeclared columns.
+    Blank dimension values become MISSING.
+    """
+    out = {}
+    for col, dtype in SCHEMA.items():
+        s = df[col]
+        if col in MEASURES:
+            s = pd.to_numeric(s, errors="coerce").round(2)
+        elif dtype.startswith("datetime"):
+            s = pd.to_datetime(s, errors="coerce")
+        elif s.isna().any():
+            s = s.astype("object").fillna(MISSING)
+        out[col] = s.astype(dtype)
+    return pd.DataFrame(out)
+
+
+def validate(df, source="export"):
+    """
+    Check a raw frame has every SCHEMA column and drop rows whose Date
+    can't be parsed. Raises ValueError on missing columns.
+    """
+    missing = [col for col in SCHEMA if col not in df.columns]
+    if missing:
+        raise ValueError(f"{source} is missing columns: {', '.join(missing)}")
+    df = df.assign(Date=pd.to_datetime(df["Date"], errors="coerce"))
+    bad = df["Date"].isna()
+    if bad.any():
+        logger.warning("%s: dropping %d rows with an invalid Date", source, bad.sum())
+        df = df[~bad]
+    return df
+
+
+def iter_csv_chunks(path=SOURCE_CSV, chunksize=1_000_000):
+    """
+    Stream the export as validated, schema-typed frames of at most
+    chunksize rows, so memory stays bounded however large the file is.
+    """
+    reader = pd.read_csv(
+        path,
+        sep=";",
+        usecols=lambda col: col in SCHEMA,
+        chunksize=chunksize
+    )
+    for i, chunk in enumerate(reader):
+        yield apply_schema(validate(chunk, f"{path} chunk {i}"))
+
+
+def concat_frames(frames):
+    """Concatenate typed frames, unioning categories so dimensions stay categorical."""
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return apply_schema(pd.DataFrame({col: [] for col in SCHEMA}))
+    out = pd.concat(frames, ignore_index=True)
+    for col in DIMENSIONS:
+        if col in out.columns:
+            out[col] = union_categoricals(
+                [f[col] for f in frames], sort_categories=True
+            )
+    return out
+
+
+def parse_csv(path=SOURCE_CSV):
+    """Parse the semicolon-delimited export straight from disk."""
+    return pd.read_csv(path, sep=";", parse_dates=["Date"])
+
+
+def _build(path):
+    raw = parse_csv(path)
+    before = memory_mb(raw)
+    df = apply_schema(raw)
+    del raw
+    after = memory_mb(df)
+    logger.info(
+        "Loaded %s: %d rows, %.1f MB raw -> %.1f MB typed",
+        path, len(df), before, after
+    )
+    return df, before, after
+
+
+def snapshot_is_fresh(path=SOURCE_CSV, cache_dir=CACHE_DIR):
+    """True when the snapshot still matches the source's size and mtime."""
+    snap_path, meta_path = _snapshot_paths(path, cache_dir)
+    meta = _read_meta(meta_path)
+    if meta is None or meta.get("version") != SNAPSHOT_VERSION:
+        return False
+    st_ = os.stat(path)
+    return (
+        os.path.exists(snap_path)
+        and meta["size"] == st_.st_size
+        and meta["mtime_ns"] == st_.st_mtime_ns
+    )
+
+
+def load_frame(path=SOURCE_CSV, cache_dir=CACHE_DIR):
+    """
+    Load the export via a Parquet snapshot, rebuilding it from the CSV
+    only when the source's size, mtime or content hash has changed.
+
+    Falls back to parsing the CSV directly if pyarrow isn't installed.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return _build(path)[0]
+
+    snap_path, meta_path = _snapshot_paths(path, cache_dir)
+    st_ = os.stat(path)
+
+    fresh = snapshot_is_fresh(path, cache_dir)
+    if fresh:
+        df = _read_snapshot(snap_path)
+        if df is not None:
+            return df
+
+    # Size or mtime moved - only re-parse if the content really changed
+    meta = _read_meta(meta_path)
+    digest = _file_hash(path)
+    if (
+        not fresh
+        and meta is not None
+        and meta.get("version") == SNAPSHOT_VERSION
+        and meta.get("sha") == digest
+        and os.path.exists(snap_path)
+    ):
+        df = _read_snapshot(snap_path)
+        if df is not None:
+            meta.update(size=st_.st_size, mtime_ns=st_.st_mtime_ns)
+            _write_json(meta_path, meta)
+            return df
+
+    df, mem_before, mem_after = _build(path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    _replace_via_tmp(snap_path, lambda tmp: df.to_parquet(tmp, index=False))
+    # Meta last: it only ever vouches for a snapshot that's fully in place
+    _write_json(meta_path, {
+        "version": SNAPSHOT_VERSION,
+        "source": os.path.abspath(path),
+        "size": st_.st_size,
+        "mtime_ns": st_.st_mtime_ns,
+        "sha": digest,
+        "rows": len(df),
+        "mem_before_mb": round(mem_before, 2),
+        "mem_after_mb": round(mem_after, 2),
+    })
+    return df
+
+
+def snapshot_meta(path=SOURCE_CSV, cache_dir=CACHE_DIR):
+    """Metadata (row count, memory before/after typing) of the current snapshot."""
+    return _read_meta(_snapshot_paths(path, cache_dir)[1])
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+# ------------------
+# Ratio metrics shared by both dashboards
+# ------------------
+# Every ratio is undefined (NaN) when its denominator is zero, missing or
+# negative - e.g. ROAS for a source with no spend - rather than inf.
+NA_REP = "n/a"
+
+
+def safe_divide(num, den):
+    """Element-wise num / den, NaN wherever den isn't a positive number."""
+    num = np.asarray(num, dtype="float64")
+    den = np.asarray(den, dtype="float64")
+    out = np.full(np.broadcast(num, den).shape, np.nan)
+    np.divide(num, den, out=out, where=den > 0)
+    return out
+
+
+def add_metrics(
+    frame,
+    cost="Cost",
+    revenue="Revenue",
+    new="New_Conversions",
+    total="Total_Conversions",
+    decimals=None
+):
+    """
+    Return a copy of an aggregated frame with ROAS, CAC, CPP, AOV, Pct_New
+    and Returning_Conversions added. Metrics whose inputs aren't columns of
+    the frame are skipped, so e.g. a Cost/Revenue-only pivot just gets ROAS.
+    """
+    has = {name: name is not None and name in frame.columns
+           for name in (cost, revenue, new, total)}
+    col = {name: frame[name].to_numpy(dtype="float64")
+           for name, present in has.items() if present}
+
+    out = {}
+    if has[revenue] and has[cost]:
+        out["ROAS"] = safe_divide(col[revenue], col[cost])
+    if has[cost] and has[new]:
+        out["CAC"] = safe_divide(col[cost], col[new])
+    if has[cost] and has[total]:
+        out["CPP"] = safe_divide(col[cost], col[total])
+    if has[revenue] and has[total]:
+        out["AOV"] = safe_divide(col[revenue], col[total])
+    if has[new] and has[total]:
+        out["Pct_New"] = safe_divide(col[new], col[total])
+        out["Returning_Conversions"] = np.clip(col[total] - col[new], 0, None)
+
+    if decimals is not None:
+        out = {k: np.round(v, decimals) for k, v in out.items()}
+    return frame.assign(**out)
+
+
+def fmt(value, spec):
+    """Format a metric for st.metric, showing NA_REP when it's undefined."""
+    if value is None or pd.isna(value):
+        return NA_REP
+    return format(value, spec)
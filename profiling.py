@@ -0,0 +1,74 @@
+import json
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# ------------------
+# Opt-in hot-path timing
+# ------------------
+# A Profiler collects one record per timed stage: which view it belongs
+# to, wall time, rows in/out and view-cache hit/miss. When disabled every
+# call is a near no-op, so instrumented code costs nothing in production.
+logger = logging.getLogger(__name__)
+
+RECORD_COLUMNS = ["run", "view", "stage", "ms", "rows_in", "rows_out", "cache"]
+
+
+def count_rows(value):
+    """Row count of a frame (or total over a tuple of frames); None otherwise."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if isinstance(value, tuple):
+        counts = [count_rows(v) for v in value]
+        return sum(c for c in counts if c is not None)
+    return None
+
+
+class Profiler:
+    def __init__(self, enabled=False, log=False, history=None, run=None):
+        self.enabled = enabled
+        self.log = log
+        self.run = run
+        self.view = None
+        # Shared across reruns (e.g. a deque in st.session_state) so fragment
+        # reruns land in the same history as full runs
+        self.records = history if history is not None else deque(maxlen=500)
+        if log and not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+
+    @contextmanager
+    def stage(self, name, rows_in=None, view=None):
+        """
+        Time the enclosed block as one stage. The yielded dict can be updated
+        with rows_out / cache once they're known.
+        """
+        record = {"run": self.run, "view": view or self.view, "stage": name,
+                  "rows_in": rows_in, "rows_out": None, "cache": None}
+        if not self.enabled:
+            yield record
+            return
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["ms"] = round((time.perf_counter() - start) * 1000, 2)
+            self.records.append(record)
+            if self.log:
+                logger.info(json.dumps(record, default=str))
+
+    def call(self, name, fn, *args, rows_in=None, **kwargs):
+        """Time fn(*args, **kwargs) as one stage, recording its output rows."""
+        with self.stage(name, rows_in=rows_in) as record:
+            result = fn(*args, **kwargs)
+            record["rows_out"] = count_rows(result)
+        return result
+
+    def frame(self):
+        """Recorded stages, newest first."""
+        return pd.DataFrame(list(self.records)[::-1], columns=RECORD_COLUMNS)
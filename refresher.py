@@ -0,0 +1,73 @@
+import logging
+import threading
+import weakref
+
+# ------------------
+# Background dataset refresh with atomic swap
+# ------------------
+# A Refresher owns the current dataset snapshot. A daemon thread polls a
+# cheap source key (file stats, store version) and, when it changes,
+# builds the next snapshot off the request path and swaps it in with a
+# single reference assignment. Readers take current() once per run, so
+# each run sees one consistent snapshot and never waits on a reload; a
+# failed build is logged and the previous snapshot keeps serving.
+#
+# The watcher only holds a weak reference to its Refresher: once the owner
+# drops it (e.g. st.cache_resource is cleared) the thread exits at its
+# next wake-up instead of polling a stale source forever.
+logger = logging.getLogger(__name__)
+
+
+class Refresher:
+    def __init__(self, key, build, interval=10.0):
+        self.key = key
+        self.build = build
+        self.interval = interval
+        self.refreshes = 0
+        self._snapshot = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Build the first snapshot in the caller's thread, then watch in the background."""
+        key = self.key()
+        self._snapshot = (key, self.build(key))
+        self._thread = threading.Thread(
+            target=_watch, args=(weakref.ref(self), self._stop, self.interval),
+            name="fospha-refresher", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def current(self):
+        """The latest built snapshot - the same object until the next swap."""
+        return self._snapshot[1]
+
+    def refresh(self):
+        """Rebuild and swap if the source key changed; True if it did."""
+        key = self.key()
+        if key == self._snapshot[0]:
+            return False
+        value = self.build(key)
+        self._snapshot = (key, value)
+        self.refreshes += 1
+        logger.info("Swapped in a new dataset (refresh %d)", self.refreshes)
+        return True
+
+    def __del__(self):
+        self._stop.set()
+
+
+def _watch(ref, stop, interval):
+    while not stop.wait(interval):
+        refresher = ref()
+        if refresher is None:
+            return
+        try:
+            refresher.refresh()
+        except Exception:
+            logger.exception("Background refresh failed; still serving the previous dataset")
+        del refresher
@@ -0,0 +1,310 @@
+import argparse
+import html
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from pandas.io.formats.style import Styler
+
+import anomalies
+import response
+import views
+from ingest import SOURCE_CSV
+from metrics import NA_REP
+from periods import label_periods, month_label
+from sources import load_data
+
+# ------------------
+# Headless batch report of every Fospha.py tab
+# ------------------
+# Runs the same views and figure builders as the dashboard, without a
+# Streamlit server, and writes each tab (per market / month where the tab
+# has one) as an HTML page plus CSV tables and optional PNG charts:
+#
+#   python report.py --out reports/2025-10-13 --markets UK US --months 202509 202510
+#
+# Independent pages are rendered in parallel worker processes; each worker
+# receives the cube once, at start-up.
+logger = logging.getLogger(__name__)
+
+FORMATS = ["html", "csv", "png"]
+
+
+# ------------------
+# Pages: each returns (title, {name: table}, {name: figure})
+# ------------------
+def channel_roas_page(cube):
+    import figures
+
+    pivot = views.channel_roas(cube)
+    return (
+        "ROAS by Channel (Paid Only)",
+        {"channel_roas": figures.channel_roas_table(pivot)},
+        {"channel_roas": figures.channel_roas_bar(pivot)},
+    )
+
+
+def paid_social_roas_page(cube, grain="Month"):
+    import figures
+
+    pivot = label_periods(views.paid_social_roas(cube, grain=grain), grain)
+    return (
+        "Paid Social ROAS Over Time",
+        {"paid_social_roas": pivot},
+        {"paid_social_roas": figures.paid_social_roas_line(pivot, grain)},
+    )
+
+
+def paid_social_sources_page(cube, month):
+    import figures
+
+    pivot = views.paid_social_sources(cube, month=month)
+    title = f"Paid Social – CAC & Cost by Source ({month_label(month)})"
+    return (
+        title,
+        {"paid_social_sources": pivot},
+        {"paid_social_sources": figures.source_cost_cac(pivot, title)},
+    )
+
+
+def market_cost_revenue_page(cube, market, grain="Month"):
+    import figures
+
+    pivot = label_periods(views.market_cost_revenue(cube, market=market, grain=grain), grain)
+    return (
+        f"{market} Cost & Revenue Over Time",
+        {"cost_revenue": pivot},
+        {"cost_revenue": figures.market_cost_revenue_lines(pivot, grain, market)},
+    )
+
+
+def paid_channel_deep_dive_page(cube, months, grain="Month"):
+    import figures
+
+    kpi, pivot = views.paid_channel_deep_dive(cube, months)
+    channels = sorted(pivot["Channel"].unique())
+    time_pivot = label_periods(
+        views.paid_channel_time_series(cube, months, channels, grain=grain), grain
+    )
+    return (
+        "Paid Channel Deep Dive",
+        {"kpi": kpi.to_frame().T, "channel_metrics": figures.metrics_table(pivot, "Channel"),
+         "cost_vs_revenue": time_pivot},
+        {
+            "efficiency": figures.channel_efficiency(pivot),
+            "new_vs_returning": figures.new_vs_returning(
+                pivot, "Channel", "New vs Returning Conversions by Paid Channel"
+            ),
+            "cost_vs_revenue": figures.cost_vs_revenue(
+                time_pivot, grain, "Paid Channel Cost vs Revenue Over Time"
+            ),
+        },
+    )
+
+
+def paid_social_deep_dive_page(cube, months, grain="Month"):
+    import figures
+
+    kpi, pivot = views.paid_social_deep_dive(cube, months)
+    sources = sorted(pivot["Source"].unique())
+    time_pivot = label_periods(
+        views.paid_social_time_series(cube, months, sources, grain=grain), grain
+    )
+    return (
+        "Paid Social Source Deep Dive",
+        {"kpi": kpi.to_frame().T, "source_metrics": figures.metrics_table(pivot, "Source"),
+         "cost_vs_revenue": time_pivot},
+        {
+            "cost_cac": figures.source_cost_cac_dive(pivot),
+            "new_vs_returning": figures.new_vs_returning(
+                pivot, "Source", "New vs Returning Conversions by Paid Social Source"
+            ),
+            "cost_vs_revenue": figures.cost_vs_revenue(
+                time_pivot, grain, "Paid Social Cost vs Revenue Over Time"
+            ),
+        },
+    )
+
+
+def anomalies_page(cube, grain="Day"):
+    import figures
+
+    flags = anomalies.scan(cube, grain)
+    summary = anomalies.flagged_series(flags, grain)
+    figs = {}
+    if len(summary):
+        worst = summary.iloc[0]
+        detail = anomalies.series_detail(
+            cube, worst["Market"], worst["Channel"], worst["Source"], worst["Metric"], grain
+        )
+        figs["worst_series"] = figures.anomaly_band(
+            detail, grain, worst["Metric"],
+            f"{worst['Market']} · {worst['Channel']} · {worst['Source']} — "
+            f"{worst['Metric']} vs Baseline"
+        )
+    return "ROAS & CAC Anomalies", {"flagged_series": summary, "flags": flags}, figs
+
+
+def budget_page(cube, level="Channel"):
+    import figures
+
+    curves = response.fit_curves(cube, level)
+    # At today's total spend: what the same money would do split optimally
+    plan = response.optimize(curves, curves["Current_Spend"].sum())
+    return (
+        f"Budget Optimizer ({level})",
+        {"split": plan, "curves": curves},
+        {
+            "split": figures.budget_split(plan, level),
+            "curves": figures.response_curves(response.curve_points(curves), plan, level),
+        },
+    )
+
+
+def plan(cube, markets=("UK",), months=None, grain="Month"):
+    """(slug, page function, kwargs) for every page of the report."""
+    months = list(months or views.available_months(cube))
+    jobs = [
+        ("task4-channel-roas", channel_roas_page, {}),
+        ("task5-paid-social-roas", paid_social_roas_page, {"grain": grain}),
+    ]
+    jobs += [
+        (f"task6-paid-social-sources-{month}", paid_social_sources_page, {"month": month})
+        for month in months
+    ]
+    jobs += [
+        (f"task7-cost-revenue-{market}", market_cost_revenue_page,
+         {"market": market, "grain": grain})
+        for market in markets
+    ]
+    jobs += [
+        ("bonus1-paid-channel-deep-dive", paid_channel_deep_dive_page,
+         {"months": months, "grain": grain}),
+        ("bonus2-paid-social-deep-dive", paid_social_deep_dive_page,
+         {"months": months, "grain": grain}),
+        # Month is too coarse for a rolling baseline, so it scans days instead
+        ("anomalies", anomalies_page,
+         {"grain": grain if grain in anomalies.SCAN_GRAINS else "Day"}),
+    ]
+    jobs += [
+        (f"budget-{level.lower()}", budget_page, {"level": level})
+        for level in response.LEVELS
+    ]
+    return jobs
+
+
+# ------------------
+# Rendering
+# ------------------
+_cube = None
+
+
+def _init_worker(cube):
+    global _cube
+    _cube = cube
+
+
+def render_page(slug, page, kwargs, out_dir, formats=("html", "csv")):
+    """Run one page against the worker's cube and write its files; returns (slug, title, paths)."""
+    title, tables, figs = page(_cube, **kwargs)
+    paths = []
+    for name, table in tables.items():
+        if "csv" in formats:
+            path = os.path.join(out_dir, f"{slug}-{name}.csv")
+            # Stylers are exported as their underlying numbers
+            data = table.data if isinstance(table, Styler) else table
+            data.to_csv(path, index=False)
+            paths.append(path)
+    if "png" in formats:
+        for name, fig in figs.items():
+            path = os.path.join(out_dir, f"{slug}-{name}.png")
+            fig.write_image(path, width=1200, height=fig.layout.height or 500)
+            paths.append(path)
+    if "html" in formats:
+        parts = [f"<h1>{html.escape(title)}</h1>"]
+        for table in tables.values():
+            if isinstance(table, Styler):
+                parts.append(table.hide(axis="index").to_html())
+            else:
+                parts.append(table.to_html(index=False, na_rep=NA_REP))
+        for fig in figs.values():
+            parts.append(fig.to_html(full_html=False, include_plotlyjs="cdn"))
+        path = os.path.join(out_dir, f"{slug}.html")
+        with open(path, "w") as f:
+            f.write(f"<html><head><meta charset='utf-8'><title>{html.escape(title)}</title>"
+                    f"</head><body>{''.join(parts)}</body></html>")
+        paths.append(path)
+    return slug, title, paths
+
+
+def _write_index(out_dir, pages):
+    links = "".join(
+        f"<li><a href='{slug}.html'>{html.escape(title)}</a> <small>{slug}</small></li>"
+        for slug, title, _ in pages
+    )
+    with open(os.path.join(out_dir, "index.html"), "w") as f:
+        f.write(f"<html><head><meta charset='utf-8'><title>Fospha report</title></head>"
+                f"<body><h1>Fospha report</h1><ul>{links}</ul></body></html>")
+
+
+def run(out_dir, cube, markets=("UK",), months=None, grain="Month",
+        formats=("html", "csv"), workers=None):
+    """Render every page into out_dir, in parallel; returns [(slug, title, paths)]."""
+    formats = list(formats)
+    if "png" in formats:
+        try:
+            import kaleido  # noqa: F401
+        except ImportError:
+            logger.warning("PNG export needs kaleido (pip install kaleido); skipping PNGs")
+            formats.remove("png")
+
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = plan(cube, markets, months, grain)
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+
+    if workers == 1:
+        _init_worker(cube)
+        pages = [render_page(*job, out_dir, formats) for job in jobs]
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=ctx,
+            initializer=_init_worker, initargs=(cube,)
+        ) as pool:
+            futures = [pool.submit(render_page, *job, out_dir, formats) for job in jobs]
+            pages = [future.result() for future in futures]
+
+    if "html" in formats:
+        _write_index(out_dir, pages)
+    return pages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render every dashboard tab to static files.")
+    parser.add_argument("--out", default="report", help="output directory")
+    parser.add_argument("--csv", default=SOURCE_CSV, help="single export to load")
+    parser.add_argument("--sources", help="directory or glob of exports (see sources.py)")
+    parser.add_argument("--markets", nargs="+", default=["UK"], help="Task 7 markets")
+    parser.add_argument("--months", nargs="+", type=int,
+                        help="YYYYMM months for Task 6 and the deep dives (default: all)")
+    parser.add_argument("--grain", choices=views.GRAINS, default="Month")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=["html", "csv"])
+    parser.add_argument("--workers", type=int, help="worker processes (default: cores)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    start = time.perf_counter()
+    cube = load_data(args.csv, args.sources)
+    pages = run(
+        args.out, cube,
+        markets=args.markets,
+        months=args.months,
+        grain=args.grain,
+        formats=args.formats,
+        workers=args.workers
+    )
+    files = sum(len(paths) for _, _, paths in pages)
+    print(f"wrote {len(pages)} pages ({files} files) to {args.out} "
+          f"in {time.perf_counter() - start:.1f}s")
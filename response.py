@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+
+import views
+from metrics import safe_divide
+
+# ------------------
+# Spend-response curves and budget reallocation
+# ------------------
+# Each paid channel (or Paid Social source) gets a diminishing-returns
+# curve fitted on its daily data:
+#
+#   revenue = a * cost ** b        (0 <= b < 1: every extra £ returns less)
+#
+# and the same for new conversions. All series are fitted together as one
+# grouped least-squares regression of log(y) on log(cost), so adding
+# series adds rows, not Python-level fits. `a` is then rescaled so each
+# curve reproduces its series' observed total at the observed spend.
+#
+# With power curves the revenue-maximizing split of a budget has every
+# series at the same marginal return (a * b * x ** (b - 1) = lambda), so
+# optimize() only has to bisect on lambda - fast enough to rerun on every
+# budget change while the fitted curves themselves are cached.
+LEVELS = {
+    "Channel": dict(Channel=views.PAID_CHANNELS),
+    "Source": dict(Channel="Paid Social"),
+}
+
+TARGETS = ["Revenue", "New_Conversions"]
+
+# Elasticity cap: b at or above 1 would mean no diminishing returns, and an
+# optimizer that puts the whole budget on one series
+MAX_ELASTICITY = 0.95
+
+# Fewer days with spend than this and the curve isn't fitted
+MIN_DAYS = 14
+
+# Curves are only trusted a little beyond the largest daily spend seen
+MAX_SCALE = 1.5
+
+
+def daily_series(data, level="Channel", **filters):
+    """Daily Cost / Revenue / New_Conversions per series at `level`."""
+    return views.query(
+        data, [level, "Date"], ["Cost", "Revenue", "New_Conversions"],
+        **LEVELS[level], **filters
+    )
+
+
+def _fit_power(codes, n, x, y):
+    # Grouped OLS of log(y) on log(x): every sum is one bincount over all series
+    ok = (x > 0) & (y > 0)
+    w = ok.astype("float64")
+    lx = np.log(x, out=np.zeros_like(x), where=ok)
+    ly = np.log(y, out=np.zeros_like(y), where=ok)
+
+    def total(values):
+        return np.bincount(codes, weights=values, minlength=n)
+
+    days = total(w)
+    dx = np.where(ok, lx - safe_divide(total(lx), days)[codes], 0.0)
+    dy = np.where(ok, ly - safe_divide(total(ly), days)[codes], 0.0)
+    sxx, sxy, syy = total(dx * dx), total(dx * dy), total(dy * dy)
+
+    b = np.clip(safe_divide(sxy, sxx), 0.0, MAX_ELASTICITY)
+    # Calibrated so the curve sums to the observed total at the observed spend
+    a = safe_divide(total(np.where(ok, y, 0.0)), total(np.where(ok, x ** b[codes], 0.0)))
+    r2 = safe_divide(sxy * sxy, sxx * syy)
+    return a, b, r2, days
+
+
+def fit_curves(data, level="Channel", min_days=MIN_DAYS, **filters):
+    """
+    One row per series at `level` with its daily spend profile and the
+    fitted a / b / R2 and days fitted on for each target. Series with fewer
+    than `min_days` such days for any target are left out.
+    """
+    daily = daily_series(data, level, **filters)
+    codes, names = pd.factorize(daily[level], sort=True)
+    n = len(names)
+    cost = daily["Cost"].to_numpy("float64")
+
+    max_cost = np.zeros(n)
+    np.maximum.at(max_cost, codes, cost)
+    curves = {
+        level: np.asarray(names),
+        # Average over every day in range, spend or not
+        "Current_Spend": np.bincount(codes, weights=cost, minlength=n)
+                         / max(daily["Date"].nunique(), 1),
+        "Max_Spend": max_cost,
+    }
+    for target in TARGETS:
+        a, b, r2, days = _fit_power(codes, n, cost, daily[target].to_numpy("float64"))
+        curves.update({f"{target}_a": a, f"{target}_b": b, f"{target}_R2": r2,
+                       f"{target}_Days": days.astype(int)})
+    # Each target is fitted on its own days (spend and a positive outcome),
+    # so a series needs enough of them for every curve
+    curves["Days"] = np.minimum.reduce([curves[f"{t}_Days"] for t in TARGETS])
+
+    curves = pd.DataFrame(curves)
+    return curves[curves["Days"] >= min_days].reset_index(drop=True)
+
+
+def predict(curves, spend, target="Revenue"):
+    """Each series' predicted daily `target` at the given daily spend(s)."""
+    a = curves[f"{target}_a"].to_numpy()
+    b = curves[f"{target}_b"].to_numpy()
+    return a * np.asarray(spend, dtype="float64") ** b
+
+
+def marginal(curves, spend, target="Revenue"):
+    """Extra `target` per extra £ of daily spend at the given spend(s)."""
+    a = curves[f"{target}_a"].to_numpy()
+    b = curves[f"{target}_b"].to_numpy()
+    with np.errstate(divide="ignore"):
+        return a * b * np.asarray(spend, dtype="float64") ** (b - 1)
+
+
+def curve_points(curves, target="Revenue", points=100, max_scale=MAX_SCALE):
+    """Long frame of each fitted curve from zero to its spend cap, for charting."""
+    level = curves.columns[0]
+    upper = max_scale * curves["Max_Spend"].to_numpy()
+    grid = upper[:, None] * np.linspace(0, 1, points)
+    a = curves[f"{target}_a"].to_numpy()[:, None]
+    b = curves[f"{target}_b"].to_numpy()[:, None]
+    return pd.DataFrame({
+        level: np.repeat(curves[level].to_numpy(), points),
+        "Spend": grid.ravel(),
+        target: (a * grid ** b).ravel(),
+    })
+
+
+def _allocate(a, b, budget, upper, iterations=100):
+    # Spend at marginal return lam is (a b / lam) ** (1 / (1 - b)), capped;
+    # the total falls as lam rises, so bisect (in log space) until it's the budget
+    if budget <= 0:
+        return np.zeros_like(upper)
+    if budget >= upper.sum():
+        return upper.copy()
+    gain = a * b
+    live = gain > 0
+    if not live.any():
+        return upper * budget / upper.sum()
+
+    def spend(lam):
+        return np.where(live, np.minimum((gain / lam) ** (1 / (1 - b)), upper), 0.0)
+
+    with np.errstate(divide="ignore"):
+        lo = np.log(np.min(gain[live] * upper[live] ** (b[live] - 1)))
+        hi = np.log(np.max(gain[live] * (budget * 1e-9) ** (b[live] - 1)))
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        if spend(np.exp(mid)).sum() > budget:
+            lo = mid
+        else:
+            hi = mid
+    return spend(np.exp(hi))
+
+
+def optimize(curves, budget, target="Revenue", max_scale=MAX_SCALE):
+    """
+    Split a total daily `budget` across the fitted series to maximize
+    predicted `target`, each capped at max_scale x its largest daily spend.
+    Returns the current and optimal spend per series with the predicted
+    revenue and new conversions at each.
+    """
+    level = curves.columns[0]
+    current = curves["Current_Spend"].to_numpy()
+    optimal = _allocate(
+        curves[f"{target}_a"].to_numpy(), curves[f"{target}_b"].to_numpy(),
+        float(budget), max_scale * curves["Max_Spend"].to_numpy()
+    )
+    plan = pd.DataFrame({
+        level: curves[level],
+        "Current_Spend": current,
+        "Optimal_Spend": optimal,
+        "Change": optimal - current,
+    })
+    for name in TARGETS:
+        plan[f"Current_{name}"] = predict(curves, current, name)
+        plan[f"Optimal_{name}"] = predict(curves, optimal, name)
+    plan["Marginal_ROAS"] = marginal(curves, optimal, "Revenue")
+    return plan
@@ -0,0 +1,170 @@
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from cube import CubeIndex
+from ingest import CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: no build lock, replicas may build concurrently
+    fcntl = None
+
+# ------------------
+# Read-only, memory-mapped dataset shared across server processes
+# ------------------
+# <shared>/<dataset id>/<i>.npy    one file per column (category codes for
+#                                  categoricals), mapped with mmap_mode="r"
+# <shared>/<dataset id>/index/<i>.order.npy, <i>.bounds.npy
+#                                  CubeIndex postings per indexed column
+# <shared>/<dataset id>/meta.json  column names, categories, index values, attrs
+# <shared>/<dataset id>.lock       held while a process builds the dataset
+#
+# The first process to need a dataset builds and publishes it under the
+# lock; replicas that start meanwhile wait on the lock and then map what
+# it published, so the export is parsed once per host. Every replica maps
+# the same files - cube and index - so the OS page cache holds one copy
+# for the whole host. Frames opened here are read-only - never mutate
+# them in place.
+SHARED_DIR = os.path.join(CACHE_DIR, "shared")
+
+# Bump when the on-disk layout changes so old datasets aren't opened
+FORMAT_VERSION = 3
+
+
+def dataset_id(key):
+    """Directory name for a dataset identified by any string key."""
+    return hashlib.blake2b(f"{FORMAT_VERSION}:{key}".encode(), digest_size=8).hexdigest()
+
+
+def publish(frame, path, index=None):
+    """Write `frame` (and its CubeIndex) as .npy files under `path`, atomically."""
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(os.path.join(tmp, "index"))
+    columns = []
+    for i, col in enumerate(frame.columns):
+        values = frame[col]
+        categories = None
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories.tolist()
+            values = values.cat.codes
+        np.save(os.path.join(tmp, f"{i}.npy"), values.to_numpy())
+        columns.append({"name": col, "categories": categories})
+    indexed = []
+    for i, (col, (values, order, bounds)) in enumerate((index.arrays if index else {}).items()):
+        np.save(os.path.join(tmp, "index", f"{i}.order.npy"), order)
+        np.save(os.path.join(tmp, "index", f"{i}.bounds.npy"), bounds)
+        indexed.append({"name": col, "values": values})
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump({"columns": columns, "index": indexed, "attrs": frame.attrs}, f)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # Another process published the same dataset first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _meta(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+
+def open_frame(path, meta=None):
+    """Map a published dataset as a DataFrame without copying its columns."""
+    meta = meta or _meta(path)
+    data = {}
+    for i, col in enumerate(meta["columns"]):
+        values = np.load(os.path.join(path, f"{i}.npy"), mmap_mode="r")
+        if col["categories"] is not None:
+            values = pd.Categorical.from_codes(values, categories=col["categories"])
+        data[col["name"]] = values
+    frame = pd.DataFrame(data, copy=False)
+    frame.attrs.update(meta["attrs"])
+    return frame
+
+
+def open_index(path):
+    """Map a published dataset and its postings as a CubeIndex, copying neither."""
+    meta = _meta(path)
+    arrays = {
+        col["name"]: (
+            col["values"],
+            np.load(os.path.join(path, "index", f"{i}.order.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "index", f"{i}.bounds.npy")),
+        )
+        for i, col in enumerate(meta["index"])
+    }
+    return CubeIndex(open_frame(path, meta), arrays=arrays)
+
+
+def _published(path):
+    try:
+        return os.stat(os.path.join(path, "meta.json")).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _prune(shared_dir, keep, previous=1):
+    # Besides `keep`, the `previous` most recently published datasets stay:
+    # replicas still opening one must find it whole, and a replica that
+    # published a stale key mustn't remove the one everyone else just mapped.
+    # Lock files are never removed - another process may be queued on one.
+    # Removal is safe while older datasets are still mapped: unlinked files
+    # stay readable until the last mapping goes away.
+    older = []
+    for name in os.listdir(shared_dir):
+        if name == keep or name.endswith((".tmp", ".lock")):
+            continue
+        published = _published(os.path.join(shared_dir, name))
+        if published is not None:
+            older.append((published, name))
+    for _, name in sorted(older, reverse=True)[previous:]:
+        path = os.path.join(shared_dir, name)
+        # Renamed away first, so the dataset vanishes at once, not file by file
+        trash = f"{path}.{uuid.uuid4().hex}.tmp"
+        with contextlib.suppress(OSError):
+            os.rename(path, trash)
+            shutil.rmtree(trash, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def _build_lock(path):
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def attach(key, build, shared_dir=SHARED_DIR):
+    """
+    Map the dataset for `key` with its CubeIndex, calling build() and
+    publishing the result first if no process has yet. Only one process
+    builds; the rest wait and map its copy. On publish, datasets older
+    than the previous one are removed.
+    """
+    name = dataset_id(key)
+    path = os.path.join(shared_dir, name)
+    try:
+        return open_index(path)
+    except FileNotFoundError:
+        # Not published yet - or pruned just now, so it's built again
+        pass
+    os.makedirs(shared_dir, exist_ok=True)
+    with _build_lock(os.path.join(shared_dir, name + ".lock")):
+        # Whoever held the lock before us may have just published it
+        if _published(path) is None:
+            cube = build()
+            publish(cube, path, CubeIndex(cube))
+            _prune(shared_dir, name)
+    return open_index(path)
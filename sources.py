@@ -0,0 +1,120 @@
+import glob
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from cube import CUBE_KEYS, build_cube
+from ingest import CACHE_DIR, MEASURES, SOURCE_CSV, concat_frames, load_frame
+from periods import month_key
+from store import STORE_DIR, store_version
+from store import load_cube as load_store_cube
+
+# ------------------
+# Parallel loading of one export per market / brand
+# ------------------
+# A source is a single export, a directory of them or a glob. Each file
+# is parsed (via its Parquet snapshot) and summed to a daily cube by its
+# own worker process; only the small cubes travel back to be merged.
+#
+# Brand comes from the layout, whichever way the spec is written: an
+# export takes the first directory below the source root, or the root's
+# own name if it sits directly in it. "exports", "exports/BrandA" and
+# "exports/BrandA/*.csv" all give exports/BrandA/UK.csv Brand "BrandA".
+# A spec inside a brand's nested folders (exports/BrandA/2024/*.csv)
+# can't be told apart from an exports root, so pass brand= for those.
+# Market is already a column in every export.
+BRAND_KEYS = CUBE_KEYS + ["Brand"]
+
+
+def expand_sources(spec):
+    """Export paths for a file, directory (searched recursively) or glob, sorted."""
+    if os.path.isdir(spec):
+        paths = glob.glob(os.path.join(spec, "**", "*.csv"), recursive=True)
+    else:
+        paths = glob.glob(spec, recursive=True)
+    if not paths:
+        raise FileNotFoundError(f"No exports found for {spec!r}")
+    return sorted(paths)
+
+
+def source_root(spec):
+    """The directory a spec's exports are found under: the directory itself or a glob's prefix."""
+    if os.path.isdir(spec):
+        return spec
+    return os.path.dirname(spec.split("*")[0]) or "."
+
+
+def brand_of(path, root):
+    parent = os.path.dirname(os.path.relpath(path, root))
+    if parent:
+        return parent.split(os.sep)[0]
+    return os.path.basename(os.path.abspath(root))
+
+
+def sources_signature(spec):
+    """(path, size, mtime) of every export - changes when a file is added or updated."""
+    return tuple(
+        (path, os.stat(path).st_size, os.stat(path).st_mtime_ns)
+        for path in expand_sources(spec)
+    )
+
+
+def _load_one(path, brand, cache_dir):
+    # Snapshots are keyed on the export's absolute path (see ingest), so
+    # BrandA/2024/UK.csv and BrandA/2025/UK.csv never share one, and a
+    # file keeps one snapshot however the spec that found it is written
+    cube = build_cube(load_frame(path, os.path.join(cache_dir, "sources")))
+    cube["Brand"] = brand
+    return cube
+
+
+def merge_cubes(parts):
+    """Merge per-file cubes, summing any Date/Market/Channel/Source/Brand overlap."""
+    merged = concat_frames(parts)
+    merged["Brand"] = merged["Brand"].astype("category")
+    return (
+        merged
+        .groupby(BRAND_KEYS, observed=True, sort=True)[MEASURES]
+        .sum()
+        .reset_index()
+    )
+
+
+def load_sources(spec, workers=None, cache_dir=CACHE_DIR, brand=None):
+    """
+    Load every export matched by `spec` into one daily cube with a Brand
+    column (`brand`, else taken from the layout), one worker process per
+    file (up to `workers`, default: cores).
+    """
+    paths = expand_sources(spec)
+    root = source_root(spec)
+    brands = [brand or brand_of(path, root) for path in paths]
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+
+    if workers == 1:
+        parts = [_load_one(p, b, cache_dir) for p, b in zip(paths, brands)]
+    else:
+        # spawn, not fork: the caller may be a threaded server (Streamlit)
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            parts = list(pool.map(_load_one, paths, brands, [cache_dir] * len(paths)))
+    return merge_cubes(parts)
+
+
+def load_data(csv_path=SOURCE_CSV, sources=None, store_dir=STORE_DIR):
+    """
+    The daily cube every consumer (dashboard, report, API) works from:
+    `sources` if given, else the incremental store if it has data, else
+    the single CSV. Adds Month and a content token in attrs["token"].
+    """
+    if sources:
+        cube = load_sources(sources)
+    elif store_version(store_dir) is not None:
+        cube = load_store_cube(store_dir)
+    else:
+        cube = build_cube(load_frame(csv_path))
+    cube["Month"] = month_key(cube["Date"])
+    cube.attrs["token"] = int(pd.util.hash_pandas_object(cube, index=False).sum())
+    return cube
@@ -0,0 +1,167 @@
+import glob
+import hashlib
+import os
+import uuid
+
+from cube import AGG_MEASURES
+from ingest import MISSING, SOURCE_CSV
+from store import STORE_DIR, cube_paths, store_version
+
+# ------------------
+# Optional embedded DuckDB backend (pip install duckdb)
+# ------------------
+# The daily cube is materialized once into a local DuckDB file and every
+# tab's filter + groupby runs as SQL against it. DuckDB scans the source
+# out of core and across all cores, so the export never has to fit in
+# process memory. No server - it's just a file next to the snapshot.
+# One file per source version: fospha-<hash of source_token>.duckdb
+DB_PATH = os.path.join(".fospha_cache", "fospha.duckdb")
+
+FILTER_COLUMNS = {"Date", "Market", "Channel", "Source", "Month"}
+
+# Bump when the cube table's layout changes so existing files get rebuilt
+DB_VERSION = 3
+
+# Same coercion as ingest.apply_schema: bad numbers become NULL, rounded to
+# 2dp, and blank dimensions become MISSING
+_CSV_ROWS = """
+SELECT
+    TRY_CAST("Date" AS DATE) AS "Date",
+    COALESCE("Market", '{missing}') AS "Market",
+    COALESCE("Channel", '{missing}') AS "Channel",
+    COALESCE("Source", '{missing}') AS "Source",
+    ROUND(TRY_CAST("Cost" AS DOUBLE), 2) AS "Cost",
+    ROUND(TRY_CAST("Fospha Attribution Revenue" AS DOUBLE), 2) AS "Fospha Attribution Revenue",
+    ROUND(TRY_CAST("Fospha Attribution New Conversions" AS DOUBLE), 2) AS "Fospha Attribution New Conversions",
+    ROUND(TRY_CAST("Fospha Attribution Conversions" AS DOUBLE), 2) AS "Fospha Attribution Conversions"
+FROM read_csv('{path}', delim=';', header=true, all_varchar=true)
+WHERE TRY_CAST("Date" AS DATE) IS NOT NULL
+"""
+
+
+def _quote(path):
+    return path.replace("'", "''")
+
+
+def source_token(csv_path=SOURCE_CSV, store_dir=STORE_DIR):
+    """Identifies the data the database was built from; changes when it does."""
+    version = store_version(store_dir)
+    if version is not None:
+        return f"v{DB_VERSION}:store:{os.path.abspath(store_dir)}:{version}"
+    st_ = os.stat(csv_path)
+    return f"v{DB_VERSION}:csv:{os.path.abspath(csv_path)}:{st_.st_size}:{st_.st_mtime_ns}"
+
+
+def _build(db_path, csv_path, store_dir, token):
+    import duckdb
+
+    if store_version(store_dir) is not None:
+        # The store already holds daily cube partitions
+        files = ", ".join(f"'{_quote(path)}'" for path in cube_paths(store_dir))
+        rows = f"SELECT * FROM read_parquet([{files}])"
+    else:
+        rows = _CSV_ROWS.format(path=_quote(csv_path), missing=_quote(MISSING))
+
+    sums = ",\n    ".join(
+        f'COALESCE(SUM("{src}"), 0) AS "{name}"' for name, src in AGG_MEASURES.items()
+    )
+
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    # A private temp name per builder: concurrent builds never write into,
+    # or delete, each other's half-built file
+    tmp = f"{db_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        _create(duckdb, tmp, rows, sums, token)
+        # Swap the finished file in so readers never see a half-built database
+        os.replace(tmp, db_path)
+    finally:
+        for leftover in (tmp, tmp + ".wal"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+def _create(duckdb, path, rows, sums, token):
+    con = duckdb.connect(path)
+    try:
+        con.execute(f"""
+            CREATE TABLE cube AS
+            SELECT
+                "Date", "Market", "Channel", "Source",
+                CAST(year("Date") * 100 + month("Date") AS INTEGER) AS "Month",
+                {sums}
+            FROM ({rows})
+            GROUP BY ALL
+            ORDER BY ALL
+        """)
+        con.execute("CREATE TABLE meta AS SELECT ? AS token", [token])
+    finally:
+        con.close()
+
+
+def _versioned(db_path, token):
+    # DuckDB shares one open instance per path within a process, so a rebuilt
+    # file at the same path would keep serving the old data to new
+    # connections while any old one is alive. Each version gets its own file.
+    stem, ext = os.path.splitext(db_path)
+    return f"{stem}-{hashlib.blake2b(token.encode(), digest_size=6).hexdigest()}{ext}"
+
+
+def _prune(db_path, keep):
+    stem, ext = os.path.splitext(db_path)
+    for path in glob.glob(glob.escape(stem) + "*" + ext):
+        if path != keep:
+            try:
+                # Connections still open on it keep reading the unlinked file
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def open_database(csv_path=SOURCE_CSV, store_dir=STORE_DIR, db_path=DB_PATH):
+    """
+    Open the cube database read-only, building it first if this version of
+    the source hasn't been built yet.
+    """
+    import duckdb
+
+    token = source_token(csv_path, store_dir)
+    path = _versioned(db_path, token)
+    if not os.path.exists(path):
+        _build(path, csv_path, store_dir, token)
+        _prune(db_path, keep=path)
+    return duckdb.connect(path, read_only=True)
+
+
+def aggregate(con, by=None, measures=None, **filters):
+    """SQL twin of cube.aggregate() - same arguments, same output columns."""
+    measures = measures or list(AGG_MEASURES)
+    by = [by] if isinstance(by, str) else list(by or [])
+    for col in by + list(filters):
+        if col not in FILTER_COLUMNS:
+            raise ValueError(f"Unknown column: {col}")
+
+    where, params = [], []
+    for col, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            value = list(value)
+            if not value:
+                where.append("FALSE")
+                continue
+            where.append(f'"{col}" IN ({", ".join("?" * len(value))})')
+            params.extend(value)
+        else:
+            where.append(f'"{col}" = ?')
+            params.append(value)
+
+    keys = ", ".join(f'"{col}"' for col in by)
+    select = ", ".join(
+        [keys] * bool(by) + [f'COALESCE(SUM("{m}"), 0) AS "{m}"' for m in measures]
+    )
+    sql = f"SELECT {select} FROM cube"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if by:
+        sql += f" GROUP BY {keys} ORDER BY {keys}"
+
+    # A cursor per query - DuckDB connections aren't safe to share across threads
+    return con.cursor().execute(sql, params).df()
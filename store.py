@@ -0,0 +1,208 @@
+import argparse
+import glob
+import json
+import os
+import uuid
+
+import pandas as pd
+
+from cube import fold_cube
+from ingest import apply_schema, concat_frames, iter_csv_chunks, parse_csv, validate
+from periods import month_key
+
+# ------------------
+# Incremental, month-partitioned dataset
+# ------------------
+# <store>/rows/<YYYY-MM>/<drop>.parquet          typed rows, one file per ingested drop
+# <store>/cube/<YYYY-MM>-<version>.parquet       daily cube for that month
+# <store>/state.json                             watermark, drops and live cube files
+#
+# Each drop only appends rows newer than the watermark and rewrites the
+# cube partitions of the months it touches, so a daily refresh costs one
+# day of data rather than the full history.
+#
+# A drop commits by writing state.json last: its rows and rewritten cube
+# partitions go to new names that only the new state refers to. A drop that
+# fails part-way leaves the store as it was, and retrying it can't fold
+# the same rows in twice.
+STORE_DIR = ".fospha_store"
+
+
+def _state_path(store_dir):
+    return os.path.join(store_dir, "state.json")
+
+
+def read_state(store_dir=STORE_DIR):
+    try:
+        with open(_state_path(store_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"watermark": None, "drops": [], "version": 0, "cube": {}}
+
+
+def _replace_via_tmp(path, write):
+    # Never a fixed "<path>.tmp": two ingests would share (and replace) it
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _write_state(store_dir, state):
+    def write(tmp):
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+    _replace_via_tmp(_state_path(store_dir), write)
+
+
+def _write_parquet(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _replace_via_tmp(path, lambda tmp: df.to_parquet(tmp, index=False))
+
+
+def _month_dir(key):
+    return f"{key // 100}-{key % 100:02d}"
+
+
+def _cube_files(state, store_dir):
+    # {month: file name under cube/}; stores written before the cube map
+    # was kept in state have one unversioned file per month
+    if "cube" in state:
+        return dict(state["cube"])
+    paths = glob.glob(os.path.join(store_dir, "cube", "*.parquet"))
+    return {os.path.basename(p)[:-len(".parquet")]: os.path.basename(p) for p in paths}
+
+
+def _prune_cube(store_dir, keep):
+    # Superseded partitions go, but the previous state's stay one more drop
+    # so a reader that read the old state.json can still open its files
+    for path in glob.glob(os.path.join(store_dir, "cube", "*.parquet")):
+        if os.path.basename(path) not in keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def store_version(store_dir=STORE_DIR):
+    """Changes every time a drop is ingested; None when there is no store."""
+    if not os.path.exists(_state_path(store_dir)):
+        return None
+    return read_state(store_dir)["version"]
+
+
+def append_chunks(chunks, store_dir=STORE_DIR, drop_name=None):
+    """
+    Append the rows of an iterable of typed frames that are newer than the
+    store's Date watermark, then refresh the cube partitions of the months
+    they fall in.
+
+    Rows are written chunk by chunk and the new cube sums are folded as they
+    go, so only one chunk plus the new months' cube is ever in memory.
+    Returns the number of rows appended.
+    """
+    state = read_state(store_dir)
+    mark = None if state["watermark"] is None else pd.Timestamp(state["watermark"])
+    drop_name = f"{drop_name or 'drop'}-{state['version'] + 1:05d}"
+
+    month_cubes = {}
+    appended = 0
+    latest = None
+    for i, df in enumerate(chunks):
+        if mark is not None:
+            df = df[df["Date"] > mark]
+        if df.empty:
+            continue
+
+        for month, part in df.groupby(month_key(df["Date"]), sort=True):
+            month = _month_dir(month)
+            _write_parquet(
+                part,
+                os.path.join(store_dir, "rows", month, f"{drop_name}-{i:05d}.parquet")
+            )
+            month_cubes[month] = fold_cube([part], month_cubes.get(month))
+
+        appended += len(df)
+        chunk_max = df["Date"].max()
+        latest = chunk_max if latest is None else max(latest, chunk_max)
+
+    if not appended:
+        return 0
+
+    # Cube partitions are additive, so fold the new rows into the old sums -
+    # read from the files the current state names, written under new names
+    old_files = _cube_files(state, store_dir)
+    files = dict(old_files)
+    for month, new_cube in month_cubes.items():
+        if month in old_files:
+            old = pd.read_parquet(os.path.join(store_dir, "cube", old_files[month]))
+            new_cube = fold_cube([new_cube], old)
+        files[month] = f"{month}-{state['version'] + 1:05d}.parquet"
+        _write_parquet(new_cube, os.path.join(store_dir, "cube", files[month]))
+
+    state["watermark"] = latest.isoformat()
+    state["drops"].append(drop_name)
+    state["version"] += 1
+    state["cube"] = files
+    _write_state(store_dir, state)
+    _prune_cube(store_dir, set(files.values()) | set(old_files.values()))
+    return appended
+
+
+def append_rows(df, store_dir=STORE_DIR, drop_name=None):
+    """Append a single typed frame; see append_chunks()."""
+    return append_chunks([df], store_dir, drop_name)
+
+
+def ingest_file(path, store_dir=STORE_DIR, chunksize=None):
+    """
+    Parse one export drop and append whatever is newer than the watermark.
+    With a chunksize the file is streamed in bounded chunks instead of
+    being read whole - use this for exports that don't fit in memory.
+    """
+    drop_name = os.path.splitext(os.path.basename(path))[0].replace(" ", "_")
+    if chunksize:
+        chunks = iter_csv_chunks(path, chunksize)
+    else:
+        chunks = [apply_schema(validate(parse_csv(path), path))]
+    return append_chunks(chunks, store_dir, drop_name)
+
+
+def cube_paths(store_dir=STORE_DIR):
+    """The cube partitions of the store's current state, oldest month first."""
+    files = _cube_files(read_state(store_dir), store_dir)
+    return [os.path.join(store_dir, "cube", files[month]) for month in sorted(files)]
+
+
+def load_rows(store_dir=STORE_DIR):
+    # Only drops the state has committed; a failed drop's rows are ignored
+    drops = set(read_state(store_dir)["drops"])
+    paths = sorted(glob.glob(os.path.join(store_dir, "rows", "*", "*.parquet")))
+    paths = [p for p in paths if os.path.basename(p).rsplit("-", 1)[0] in drops]
+    return concat_frames([pd.read_parquet(p) for p in paths])
+
+
+def load_cube(store_dir=STORE_DIR):
+    return concat_frames([pd.read_parquet(p) for p in cube_paths(store_dir)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Append export drops to the incremental store, oldest first."
+    )
+    parser.add_argument("patterns", nargs="+", help="CSV paths or globs")
+    parser.add_argument("--store", default=STORE_DIR)
+    parser.add_argument(
+        "--chunksize", type=int, default=None,
+        help="stream each file in chunks of this many rows"
+    )
+    args = parser.parse_args()
+
+    for pattern in args.patterns:
+        for path in sorted(glob.glob(pattern)):
+            rows = ingest_file(path, args.store, args.chunksize)
+            print(f"{path}: {rows} new rows")
+    print(f"watermark: {read_state(args.store)['watermark']}")
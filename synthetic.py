@@ -0,0 +1,110 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# ------------------
+# Synthetic exports in the "Fospha Data 2.csv" layout
+# ------------------
+# The real markets/channels/sources come first so every dashboard tab has
+# data to show; extra cardinality is padded with generated names.
+BASE_MARKETS = ["UK", "US", "DE", "FR", "AU"]
+
+BASE_SOURCES = {
+    "Paid Social": ["Facebook", "TikTok", "Snapchat", "Pinterest"],
+    "Paid Search - Generic": ["Google", "Bing"],
+    "Paid Shopping": ["Google", "Bing"],
+    "Performance Max": ["Google"],
+    "Organic Search": ["Google", "Bing"],
+    "Direct": ["Direct"],
+}
+
+
+def _names(base, n, prefix):
+    return (list(base) + [f"{prefix} {i}" for i in range(len(base), n)])[:n]
+
+
+def dimension_pairs(channels=6, sources_per_channel=4):
+    """(Channel, Source) pairs for the requested cardinality."""
+    pairs = []
+    for channel in _names(BASE_SOURCES, channels, "Channel"):
+        base = BASE_SOURCES.get(channel, [])
+        for source in _names(base, max(sources_per_channel, len(base)), f"{channel} Source"):
+            pairs.append((channel, source))
+    return pairs
+
+
+def generate(
+    path,
+    rows,
+    markets=3,
+    channels=6,
+    sources_per_channel=4,
+    start="2025-06-01",
+    days=153,
+    chunk_rows=1_000_000,
+    seed=0
+):
+    """
+    Write `rows` synthetic rows to `path`, chunk by chunk so any size fits
+    in memory. Pinterest never spends, like the real export.
+    """
+    rng = np.random.default_rng(seed)
+    market_names = np.array(_names(BASE_MARKETS, markets, "Market"))
+    pairs = dimension_pairs(channels, sources_per_channel)
+    pair_channel = np.array([c for c, _ in pairs])
+    pair_source = np.array([s for _, s in pairs])
+    # Each pair gets its own ROAS level so the metrics aren't flat
+    pair_roas = rng.uniform(1.5, 5.0, len(pairs))
+    zero_spend = pair_source == "Pinterest"
+    dates = pd.date_range(start, periods=days).strftime("%Y-%m-%d").to_numpy()
+
+    tmp = path + ".tmp"
+    written = 0
+    with open(tmp, "w", newline="") as f:
+        while written < rows:
+            n = min(chunk_rows, rows - written)
+            pair = rng.integers(0, len(pairs), n)
+            cost = np.where(zero_spend[pair], 0.0, rng.gamma(2.0, 50.0, n))
+            conversions = rng.gamma(2.0, 2.0, n)
+            chunk = pd.DataFrame({
+                "Date": dates[rng.integers(0, days, n)],
+                "Market": market_names[rng.integers(0, len(market_names), n)],
+                "Channel": pair_channel[pair],
+                "Source": pair_source[pair],
+                "Cost": cost.round(2),
+                "Fospha Attribution Conversions": conversions.round(2),
+                "Fospha Attribution Revenue": (
+                    (cost + rng.gamma(1.0, 5.0, n)) * pair_roas[pair]
+                ).round(2),
+                "Fospha Attribution New Conversions": (
+                    conversions * rng.uniform(0.2, 0.8, n)
+                ).round(2),
+            })
+            chunk.to_csv(f, sep=";", index=False, header=written == 0)
+            written += n
+    os.replace(tmp, path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Fospha export.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--out", default="synthetic.csv")
+    parser.add_argument("--markets", type=int, default=3)
+    parser.add_argument("--channels", type=int, default=6)
+    parser.add_argument("--sources", type=int, default=4, help="sources per channel")
+    parser.add_argument("--days", type=int, default=153)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate(
+        args.out, args.rows,
+        markets=args.markets,
+        channels=args.channels,
+        sources_per_channel=args.sources,
+        days=args.days,
+        seed=args.seed
+    )
+    print(f"wrote {args.rows:,} rows to {args.out}")
@@ -0,0 +1,194 @@
+import pandas as pd
+
+from cube import CubeIndex, aggregate, rollup
+from metrics import add_metrics
+
+# ------------------
+# Headless per-view computations
+# ------------------
+# Every function takes `data` - the daily cube DataFrame (or a row-level
+# frame with the same columns), a CubeIndex over the cube, or a DuckDB
+# connection from sql_backend - plus its filter parameters, and returns
+# plain DataFrames. Nothing here touches Streamlit, so views can be
+# imported, cached, profiled and run in batch outside a script run.
+PAID_CHANNELS = [
+    "Paid Search - Generic",
+    "Paid Shopping",
+    "Paid Social",
+    "Performance Max"
+]
+
+# Partials the deep-dive KPI strips and tables are answered from: a month
+# selection then sums a few rows per month instead of filtering the cube
+ROLLUPS = {
+    "paid_channel": dict(keys=["Month", "Channel"], Channel=PAID_CHANNELS),
+    "paid_social": dict(keys=["Month", "Channel", "Source"], Channel="Paid Social"),
+}
+
+# Time buckets for the over-time views; each names the output's x column
+GRAINS = ["Month", "Week", "Day"]
+
+
+def query(data, by=None, measures=None, **filters):
+    """Filter + sum `data` by the given column(s), on whichever backend it is."""
+    if isinstance(data, CubeIndex):
+        return aggregate(data.select(**filters), by, measures)
+    if isinstance(data, pd.DataFrame):
+        return aggregate(data, by, measures, **filters)
+    from sql_backend import aggregate as sql_aggregate
+    return sql_aggregate(data, by, measures, **filters)
+
+
+def _over_time(data, grain, measures, **filters):
+    """Sum `measures` per time bucket at the given grain, in time order."""
+    if grain == "Month":
+        # YYYYMM keys already sort chronologically
+        return query(data, "Month", measures=measures, **filters)
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown grain: {grain}")
+    daily = query(data, "Date", measures=measures, **filters)
+    daily["Date"] = pd.to_datetime(daily["Date"])
+    if grain == "Day":
+        return daily.rename(columns={"Date": "Day"})
+    week = daily["Date"].dt.to_period("W").dt.start_time.rename("Week")
+    return daily.groupby(week)[measures].sum().reset_index()
+
+
+def _pinterest_last(pivot):
+    source_order = [
+        s for s in pivot["Source"].unique()
+        if s.lower() != "pinterest"
+    ] + ["Pinterest"]
+    pivot["Source"] = pd.Categorical(pivot["Source"], categories=source_order, ordered=True)
+    return pivot.sort_values("Source")
+
+
+def rollups(cube):
+    """ROLLUPS summed from a cube DataFrame, by name."""
+    return {name: rollup(cube, **spec) for name, spec in ROLLUPS.items()}
+
+
+def available_months(data):
+    """Month keys (YYYYMM ints, see periods.py) present in the data, oldest first."""
+    return query(data, "Month", measures=["Cost"])["Month"].tolist()
+
+
+# ------------------
+# Fospha.py
+# ------------------
+def channel_roas(data, channels=PAID_CHANNELS):
+    """Task 4: cost, revenue and ratio metrics per paid channel."""
+    return add_metrics(query(data, "Channel", Channel=channels), decimals=2)
+
+
+def paid_social_roas(data, grain="Month"):
+    """Task 5: Paid Social cost, revenue and ROAS over time."""
+    pivot = _over_time(data, grain, ["Cost", "Revenue"], Channel="Paid Social")
+    return add_metrics(pivot)
+
+
+def paid_social_sources(data, month=None):
+    """
+    Task 6: Paid Social cost and CAC by source for one month (default: the
+    latest), Pinterest last.
+    """
+    if month is None:
+        month = available_months(data)[-1]
+    pivot = query(
+        data,
+        "Source",
+        measures=["Cost", "New_Conversions"],
+        Channel="Paid Social",
+        Month=month
+    )
+    return _pinterest_last(add_metrics(pivot))
+
+
+def market_cost_revenue(data, market="UK", grain="Month"):
+    """Task 7: cost and revenue over time for one market."""
+    return _over_time(data, grain, ["Cost", "Revenue"], Market=market)
+
+
+def paid_channel_deep_dive(data, months):
+    """
+    Bonus Task 1: KPI totals and per-channel metrics for the selected months.
+    `data` can also be the "paid_channel" rollup.
+    """
+    filters = dict(Channel=PAID_CHANNELS, Month=months)
+    kpi = add_metrics(query(data, **filters)).iloc[0]
+    return kpi, add_metrics(query(data, "Channel", **filters))
+
+
+def paid_channel_time_series(data, months, channels, grain="Month"):
+    """Bonus Task 1: cost and revenue over time for the selected channels."""
+    return _over_time(
+        data, grain, ["Cost", "Revenue"], Channel=channels, Month=months
+    )
+
+
+def paid_social_deep_dive(data, months):
+    """
+    Bonus Task 2: KPI totals and per-source metrics for the selected months.
+    `data` can also be the "paid_social" rollup.
+    """
+    filters = dict(Channel="Paid Social", Month=months)
+    kpi = add_metrics(query(data, **filters)).iloc[0]
+    return kpi, _pinterest_last(add_metrics(query(data, "Source", **filters)))
+
+
+def paid_social_time_series(data, months, sources, grain="Month"):
+    """Bonus Task 2: cost and revenue over time for the selected Paid Social sources."""
+    return _over_time(
+        data,
+        grain,
+        ["Cost", "Revenue"],
+        Channel="Paid Social",
+        Month=months,
+        Source=sources
+    )
+
+
+# ------------------
+# FosphaOG.py (row-level frame with a Date_Year_Month column)
+# ------------------
+_SUMMARY_NAMES = {
+    "Cost": "Total_Cost",
+    "Revenue": "Total_Revenue",
+    "New_Conversions": "Total_New_Conv"
+}
+
+
+def _summary_metrics(frame):
+    return add_metrics(
+        frame.rename(columns=_SUMMARY_NAMES),
+        cost="Total_Cost", revenue="Total_Revenue", new="Total_New_Conv"
+    )
+
+
+def overview_totals(df):
+    """Overall cost, revenue, new conversions, ROAS and CAC."""
+    return _summary_metrics(aggregate(df, measures=list(_SUMMARY_NAMES))).iloc[0]
+
+
+def monthly_summary(df, market=None):
+    """Total cost, revenue, new conversions, ROAS and CAC per year-month, in date order."""
+    filters = {} if market is None else {"Market": market}
+    summary = aggregate(df, "Date_Year_Month", measures=list(_SUMMARY_NAMES), **filters)
+    summary["Date_Year_Month"] = pd.to_datetime(summary["Date_Year_Month"].astype(str))
+    return _summary_metrics(summary.sort_values("Date_Year_Month"))
+
+
+def paid_social_source_performance(df, month, market):
+    """Paid Social ROAS and CAC by source for one year-month and market; spend > 0 only."""
+    source_perf = aggregate(
+        df,
+        "Source",
+        measures=["Cost", "Revenue", "Total_Conversions", "New_Conversions"],
+        Channel="Paid Social",
+        Date_Year_Month=month,
+        Market=market
+    ).rename(columns={"Total_Conversions": "Conversions"})
+    source_perf = add_metrics(source_perf, total=None)
+
+    # Remove zero-spend rows
+    return source_perf[source_perf["Cost"] > 0]